@@ -1,12 +1,16 @@
 import streamlit as st
 import os
 import random
-import shutil
-import zipfile
-import pandas as pd
-from PIL import Image
-from streamlit_gsheets import GSheetsConnection
-import plant_expert
+import time
+from urllib.parse import quote
+import compress_images
+import catalog
+import progress_sync
+import image_cache
+import prefetch
+import deck
+import zip_deck
+import metrics
 
 # --- 🎨 UI 配置 ---
 st.set_page_config(page_title="百植斩 - 你的植物记忆神器", page_icon="⚔️", layout="centered")
@@ -30,139 +34,230 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-TEMP_DIR = "temp_upload"
+# 用户进度在本会话里缓存多久 (秒)，过期才重新读云端；点 🔄 也会强制刷新
+PROGRESS_TTL = 600
 
+# 卡片图片那一栏在电脑上大约 420px 宽，手机上占满屏幕
+CARD_IMAGE_SIZES = "(max-width: 640px) 100vw, 420px"
+# API 模式下载网图时缩到的最长边
+CARD_IMAGE_MAX_SIDE = 800
 
-def clear_temp_dir():
-    if os.path.exists(TEMP_DIR): shutil.rmtree(TEMP_DIR)
-    os.makedirs(TEMP_DIR, exist_ok=True)
+# 管理面板 (能看统计、清空统计)：只有设了环境变量 PLANT_ADMIN=1 的部署才显示
+ADMIN_ENABLED = os.environ.get("PLANT_ADMIN") == "1"
+# 设了端口就在这个进程里开 /metrics 给 Prometheus 抓
+METRICS_PORT = os.environ.get("PLANT_METRICS_PORT")
 
 
-def contains_chinese(text):
-    if not text: return False
-    for char in text:
-        if '\u4e00' <= char <= '\u9fff': return True
-    return False
+def local_image_html(image_path):
+    """
+    有离线生成的小图 (compress_images.build_derivatives) 就返回 <picture> 标签：
+    浏览器按屏幕宽度自己挑 480/800、优先 WebP，服务器直接发静态文件，Python 不用解码。
+    没有小图返回 None。
+    """
+    try:
+        paths = {(size, ext): compress_images.derivative_path(image_path, size, ext)
+                 for size in compress_images.DERIVED_SIZES for ext in ("webp", "jpg")}
+    except ValueError:
+        return None
+    if not all(os.path.exists(p) for p in paths.values()): return None
+
+    def srcset(ext):
+        return ", ".join(f"app/{quote(paths[(size, ext)].replace(os.sep, '/'))} {size}w"
+                         for size in compress_images.DERIVED_SIZES)
+
+    fallback = quote(paths[(max(compress_images.DERIVED_SIZES), "jpg")].replace(os.sep, "/"))
+    return f"""
+    <picture>
+      <source type="image/webp" srcset="{srcset('webp')}" sizes="{CARD_IMAGE_SIZES}">
+      <img src="app/{fallback}" srcset="{srcset('jpg')}" sizes="{CARD_IMAGE_SIZES}"
+           style="width: 100%; border-radius: 0.5rem;" alt="plant">
+    </picture>
+    """
 
 
 # --- ☁️ 数据库 ---
-def get_db_connection(): return st.connection("gsheets", type=GSheetsConnection)
+def get_db_connection():
+    from streamlit_gsheets import GSheetsConnection  # 登录后才用得到，首屏不加载 (连带 pandas)
+
+    return st.connection("gsheets", type=GSheetsConnection)
+
+
+@st.cache_resource
+def get_progress_sync():
+    """进程内唯一的写回队列：斩杀记录先存本地，后台按行批量写回 Sheet1"""
+    conn = get_db_connection()
+    return progress_sync.ProgressSync(lambda: conn.client._select_worksheet(worksheet="Sheet1"))
 
 
 def get_user_data(user_name):
+    """读云端的已斩杀列表 (带上还没写回的本地记录)；读失败返回 None"""
+    import pandas as pd
+
     try:
         conn = get_db_connection()
         df = conn.read(worksheet="Sheet1", usecols=[0, 1], ttl=0)
-        if df.empty: return []
+        if df.empty: return get_progress_sync().apply_pending(user_name, [])
         row = df[df["User"] == user_name]
-        return row.iloc[0]["Mastered_Plants"].split(",") if not row.empty and pd.notna(
+        remote = row.iloc[0]["Mastered_Plants"].split(",") if not row.empty and pd.notna(
             row.iloc[0]["Mastered_Plants"]) and row.iloc[0]["Mastered_Plants"] else []
+        # 还没写回云端的本地记录也要算上
+        return get_progress_sync().apply_pending(user_name, remote)
     except:
-        return []
+        return None
 
 
-def sync_progress(user_name, plant_name, action="add"):
-    conn = get_db_connection()
-    df = conn.read(worksheet="Sheet1", usecols=[0, 1], ttl=0)
-    if df.empty: df = pd.DataFrame(columns=["User", "Mastered_Plants"])
-    if user_name not in df["User"].values:
-        df = pd.concat([df, pd.DataFrame({"User": [user_name], "Mastered_Plants": [""]})], ignore_index=True)
-    idx = df.index[df["User"] == user_name][0]
-    curr = df.at[idx, "Mastered_Plants"].split(",") if pd.notna(df.at[idx, "Mastered_Plants"]) and df.at[
-        idx, "Mastered_Plants"] else []
-    if action == "add" and plant_name not in curr:
-        curr.append(plant_name)
-    elif action == "remove" and plant_name in curr:
-        curr.remove(plant_name)
-    df.at[idx, "Mastered_Plants"] = ",".join(curr)
-    conn.update(worksheet="Sheet1", data=df)
-    return len(curr)
+def load_progress(user_name, force=False):
+    """
+    本会话的进度缓存：登录时读一次云端，之后按钮点来点去都不再读，
+    斩杀时在本地直接改；超过 PROGRESS_TTL 或手动刷新才重新读。
+    """
+    cached = st.session_state.get("progress")
+    if (not force and cached and cached["user"] == user_name
+            and time.time() - cached["loaded_at"] < PROGRESS_TTL):
+        return cached["plants"]
+
+    plants = get_user_data(user_name)
+    if plants is None:
+        # 云端读不到：上次的列表 (没有就从空列表起) 加上还没写回的本地记录，
+        # 刚斩杀的不会又冒出来；loaded_at 记 0，下次再试着读云端
+        base = cached["plants"] if cached and cached["user"] == user_name else []
+        plants = get_progress_sync().apply_pending(user_name, base)
+        st.session_state.progress = {"user": user_name, "plants": plants, "loaded_at": 0}
+        return plants
+    st.session_state.progress = {"user": user_name, "plants": plants, "loaded_at": time.time()}
+    return plants
 
 
-# --- 🌱 内容源处理 ---
+def sync_progress(user_name, plant_name, action="add"):
+    """记进本地队列 (后台批量写回云端，不再整表覆盖)，同时更新本会话的进度缓存，返回最新的斩杀数"""
+    get_progress_sync().record(user_name, plant_name, action)
+    cached = st.session_state.get("progress")
+    if cached and cached["user"] == user_name:
+        cached["plants"] = progress_sync.apply_events(cached["plants"], [(plant_name, action)])
+        return len(cached["plants"])
+    return len(load_progress(user_name, force=True))
 
-def get_local_plants(base_dir):
-    """读取本地文件夹"""
-    lst = []
-    if os.path.exists(base_dir):
-        for n in os.listdir(base_dir):
-            if os.path.isdir(os.path.join(base_dir, n)):
-                fp = os.path.join(base_dir, n)
-                imgs = [f for f in os.listdir(fp) if f.lower().endswith(('.jpg', '.png', '.jpeg'))]
-                if imgs: lst.append({"name": n, "type": "local", "image_path": os.path.join(fp, random.choice(imgs)),
-                                     "folder_path": fp})
-    return lst
 
+# --- 🌱 内容源处理 ---
 
-def parse_txt_content(content):
+@st.cache_resource(max_entries=1)
+def load_catalog(stamp):
     """
-    🌟 智能解析 TXT 内容
-    支持格式：
-    1. 仅名字: 玫瑰
-    2. 带详情: 玫瑰#蔷薇科#蔷薇属#Rosa rugosa
+    系统题库的卡片表：每个进程只建一份，所有会话共用 (会话里只存下标)；
+    题库目录有变动 (stamp 变了) 才重新读索引
     """
-    lines = [l.strip() for l in content.split('\n') if l.strip()]
-    plant_objects = []
+    return [{"name": e["name"], "type": "local", "images": [img["path"] for img in e["images"]],
+             "folder_path": e["folder"], "info": e["info"]} for e in catalog.load()]
+
+
+def get_catalog_plants():
+    """系统题库 (来自索引，不扫目录、不读 info.txt)"""
+    return load_catalog(str(catalog.roots_stamp()))
+
+
+def card_key(card):
+    if card['type'] == 'zip': return card['name'], card['image_member']
+    return card['name'], card.get("user_info", {}).get("scientific_name")
+
 
-    for line in lines:
-        parts = line.split('#')  # 使用 # 作为分隔符
-        name = parts[0].strip()
+def resolve_card(card):
+    """预取用：ZIP 卡片只解压这一张图，API 卡片去查资料"""
+    if card['type'] == 'zip': return card['deck'].load_card(card)
+    return resolve_api_card(card)
 
-        # 基础对象
-        obj = {"name": name, "type": "api", "user_info": {}}
 
-        # 如果用户提供了额外信息，存入 user_info
-        # 顺序约定：名字 # 科 # 属 # 学名
-        if len(parts) > 1 and parts[1].strip(): obj["user_info"]["family_cn"] = parts[1].strip()
-        if len(parts) > 2 and parts[2].strip(): obj["user_info"]["genus_cn"] = parts[2].strip()
-        if len(parts) > 3 and parts[3].strip(): obj["user_info"]["scientific_name"] = parts[3].strip()
+def resolve_api_card(card):
+    """
+    API 模式准备一张卡片：查资料 + 下载缩好的图。
+    预取线程里也会调用它，所以这里不能用 st.*。
+    """
+    import plant_expert  # 只有 API 模式 (和本地缺资料时) 才加载，连带 requests
+
+    plant_data = {"name_cn": card['name']}
+    user_provided = card.get("user_info", {})
+
+    # 如果用户提供了学名，这非常宝贵！我们用它来搜图，准度Max！
+    # 但我们不需要再去查文本资料了，因为用户已经提供了
+    if user_provided.get("scientific_name"):
+        # 只搜图，不覆盖文本
+        # 这里的 fetch_plant_info 会优先用学名搜
+        info = plant_expert.fetch_plant_info(user_provided['scientific_name'], verbose=False)
+
+        # 构造数据：用户提供的文本 + 网上搜到的图
+        plant_data.update(user_provided)  # 文本信用户的
+        if info and info.get('image_url'):
+            plant_data['image_url'] = info['image_url']  # 图用网上的
+            plant_data['image_candidates'] = info.get('image_candidates', [])
+        else:
+            plant_data['error'] = False  # 即使没图也不算错，只要有文本就行
 
-        plant_objects.append(obj)
+    # 如果用户啥都没提供，那就全网裸搜
+    else:
+        info = plant_expert.fetch_plant_info(card['name'], verbose=False)
+        if info:
+            plant_data.update(info)
+        else:
+            plant_data["error"] = True
 
-    return plant_objects
+    # 图在服务器上下好、校验、缩好存进本地缓存，页面只从缓存出图；这张挂了就换下一张候选
+    if plant_data.get("image_url"):
+        candidates = [plant_data["image_url"]] + plant_data.pop("image_candidates", [])
+        used, path = image_cache.fetch_first(candidates, max_side=CARD_IMAGE_MAX_SIDE)
+        if path: plant_data.update(image_url=used, image_file=path)
+    return plant_data
 
 
 # --- 🔄 状态管理 ---
-if 'quiz_list' not in st.session_state: st.session_state.quiz_list = []
-if 'current_index' not in st.session_state: st.session_state.current_index = 0
+if 'deck' not in st.session_state: st.session_state.deck = None
 if 'show_answer' not in st.session_state: st.session_state.show_answer = False
 if 'current_plant_data' not in st.session_state: st.session_state.current_plant_data = None
 if 'mastered_count' not in st.session_state: st.session_state.mastered_count = 0
 if 'current_mode' not in st.session_state: st.session_state.current_mode = "1. 🏛️ 系统题库 (默认)"
-if 'history' not in st.session_state: st.session_state.history = []
+if 'history' not in st.session_state: st.session_state.history = deck.new_history()
+if 'prefetcher' not in st.session_state:
+    st.session_state.prefetcher = prefetch.Prefetcher(resolve_card, key=card_key)
 
 
 # --- 🎮 动作函数 ---
+def start_deck(table, ids, mode):
+    """换题单：会话里只留卡片 ID，卡片表 table 可以是全进程共用的"""
+    st.session_state.deck = deck.Deck(table, ids)
+    st.session_state.prefetcher.reset()
+    st.session_state.current_mode = mode
+    st.session_state.current_plant_data = None
+    st.session_state.show_answer = False
+    st.session_state.history = deck.new_history()
+
+
 def save_to_history():
-    st.session_state.history.append({
-        "index": st.session_state.current_index,
-        "data": st.session_state.current_plant_data,
-        "show_answer": True
-    })
+    st.session_state.history.append(st.session_state.deck.current_id())
 
 
 def go_back():
-    if st.session_state.history:
-        last = st.session_state.history.pop()
-        st.session_state.current_index = last["index"]
-        st.session_state.current_plant_data = last["data"]
-        st.session_state.show_answer = last["show_answer"]
+    # 退回去的那张要是已经斩杀了，就接着往前找
+    while st.session_state.history:
+        if st.session_state.deck.seek(st.session_state.history.pop()):
+            st.session_state.current_plant_data = None
+            st.session_state.show_answer = True
+            return
+
+
+def show_answer():
+    st.session_state.show_answer = True
 
 
 def go_next():
     save_to_history()
-    st.session_state.current_index = (st.session_state.current_index + 1) % len(st.session_state.quiz_list)
+    st.session_state.deck.next()
     st.session_state.show_answer = False
     st.session_state.current_plant_data = None
 
 
 def do_master(user_name, plant_name):
     save_to_history()
-    st.session_state.quiz_list.pop(st.session_state.current_index)
-    if st.session_state.current_index >= len(st.session_state.quiz_list): st.session_state.current_index = 0
-    with st.spinner("同步云端..."):
-        st.session_state.mastered_count = sync_progress(user_name, plant_name, "add")
-    st.toast(f"⚔️ 斩杀成功！", icon="🔥")
+    st.session_state.deck.remove_current()
+    st.session_state.mastered_count = sync_progress(user_name, plant_name, "add")
+    st.session_state.toast = "⚔️ 斩杀成功！"  # 回调里不能弹 toast，卡片重跑时再弹
     st.session_state.show_answer = False
     st.session_state.current_plant_data = None
 
@@ -172,26 +267,26 @@ with st.sidebar:
     st.markdown("## 👤 用户登录")
     user_name = st.text_input("斩杀者姓名：", placeholder="输入ID自动同步进度")
     if user_name:
-        ml = get_user_data(user_name)
+        if st.button("🔄 刷新进度", use_container_width=True):
+            load_progress(user_name, force=True)
+        ml = load_progress(user_name)
         st.session_state.mastered_count = len(ml)
-        st.success(f"⚡ 进度同步！已斩杀：{len(ml)}")
+        st.success("⚡ 进度同步！")  # 斩杀数在卡片上显示，斩杀时只重跑卡片，这里的数会过时
         st.markdown("---")
         st.markdown("## 📂 模式选择")
         mode = st.radio("复习方式：", ["1. 🏛️ 系统题库 (默认)", "2. 🧠 智能搜图 (API)", "3. 📂 我的图片包 (ZIP)"], index=0)
 
-        if mode != st.session_state.current_mode: st.session_state.history = []
+        if mode != st.session_state.current_mode:
+            st.session_state.history = deck.new_history()
+            st.session_state.prefetcher.reset()
 
+        mastered = set(ml)
         if mode.startswith("1"):
-            if st.session_state.current_mode != mode or not st.session_state.quiz_list:
-                raw = get_local_plants("images/common") + get_local_plants("images/important")
-                flt = [p for p in raw if p['name'] not in ml]
-                if flt:
-                    random.shuffle(flt)
-                    st.session_state.quiz_list = flt
-                    st.session_state.current_index = 0
-                    st.session_state.current_mode = mode
-                    st.session_state.current_plant_data = None
-                    st.session_state.show_answer = False
+            if st.session_state.current_mode != mode or not st.session_state.deck:
+                table = get_catalog_plants()
+                ids = [i for i, p in enumerate(table) if p['name'] not in mastered]
+                if ids:
+                    start_deck(table, ids, mode)
                     st.rerun()
 
         elif mode.startswith("2"):
@@ -202,213 +297,211 @@ with st.sidebar:
             txt = st.file_uploader("📄 上传名单 (txt)", type="txt")
             if txt and st.button("🚀 开始复习", use_container_width=True):
                 # 调用新的解析函数
-                raw_objects = parse_txt_content(txt.getvalue().decode("utf-8"))
-                flt = [obj for obj in raw_objects if obj['name'] not in ml]
-
-                st.session_state.quiz_list = flt
-                random.shuffle(st.session_state.quiz_list)
-                st.session_state.current_index = 0
-                st.session_state.current_mode = mode
-                st.session_state.current_plant_data = None
-                st.session_state.show_answer = False
-                st.session_state.history = []
+                table = [obj for obj in deck.parse_txt_content(txt.getvalue().decode("utf-8"))
+                         if obj['name'] not in mastered]
+                start_deck(table, range(len(table)), mode)
                 st.rerun()
 
         elif mode.startswith("3"):
             st.caption("📝 上传 ZIP 图片包。如果包内包含 info.txt，将直接使用。")
             zipf = st.file_uploader("📦 上传图片包 (zip)", type="zip")
-            if zipf and st.button("📂 解压加载", use_container_width=True):
-                clear_temp_dir()
-                with zipfile.ZipFile(zipf, 'r') as z:
-                    z.extractall(TEMP_DIR)
-                root = TEMP_DIR
-                if len(os.listdir(TEMP_DIR)) == 1: root = os.path.join(TEMP_DIR, os.listdir(TEMP_DIR)[0])
-                raw = get_local_plants(root)
-                flt = [p for p in raw if p['name'] not in ml]
-                random.shuffle(flt)
-                st.session_state.quiz_list = flt
-                st.session_state.current_index = 0
-                st.session_state.current_mode = mode
-                st.session_state.current_plant_data = None
-                st.session_state.show_answer = False
-                st.session_state.history = []
+            if zipf and st.button("📂 加载图片包", use_container_width=True):
+                # 只读目录不解压，翻到哪张再解压哪张；每个会话自己一份
+                try:
+                    pack = zip_deck.ZipDeck(zipf)
+                except zip_deck.ZipDeckError as e:
+                    st.error(f"❌ {e}")
+                    st.stop()
+                table = [p for p in pack.cards() if p['name'] not in mastered]
+                start_deck(table, range(len(table)), mode)
                 st.rerun()
 
+
+@st.cache_resource
+def start_metrics_server(port):
+    return metrics.serve(int(port))
+
+
+if METRICS_PORT: start_metrics_server(METRICS_PORT)
+
+# --- 🛠️ 管理面板 ---
+if ADMIN_ENABLED:
+    with st.sidebar.expander("🛠️ 管理面板", expanded=False):
+        rows = metrics.summary()
+        if rows:
+            st.caption("各数据源：次数 / 命中率 / 延迟 (ms) / 流量")
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+            st.caption("最近的调用")
+            st.dataframe(metrics.recent(30), use_container_width=True, hide_index=True)
+        else:
+            st.caption("还没有统计数据" if metrics.ENABLED else "统计已关闭 (PLANT_METRICS=0)")
+        st.caption(f"进度写回队列：{get_progress_sync().status()}")
+        st.caption(f"图片缓存：{image_cache.stats()}")
+        st.caption(f"本会话题单 + 历史 ≈ {deck.deep_size([st.session_state.deck, st.session_state.history]) / 1024:.1f} KB")
+        st.download_button("⬇️ Prometheus 指标", metrics.prometheus(), file_name="metrics.prom", mime="text/plain")
+        if st.button("🧹 清空统计"):
+            metrics.reset()
+            st.rerun()
+
 st.markdown('<p class="main-title">⚔️ 百植斩</p>', unsafe_allow_html=True)
 st.markdown('<p class="sub-title">Plant Slasher - 你的植物记忆神器</p>', unsafe_allow_html=True)
 
 if not user_name:
     st.info("👈 请先在左侧输入名字登录")
     st.stop()
-if not st.session_state.quiz_list:
-    st.success("🎉 恭喜！当前题库已全部斩杀！")
-    if st.button("🔄 重置"):
-        st.cache_data.clear()
-        st.rerun()
-    st.stop()
 
-curr = st.session_state.quiz_list[st.session_state.current_index]
 
-# --- 🧠 核心数据获取 (终极逻辑) ---
-if (st.session_state.current_plant_data is None or
-        st.session_state.current_plant_data.get('name_cn') != curr['name']):
+@st.fragment
+def quiz_card(user_name):
+    """
+    卡片和四个按钮：按钮用 on_click 回调改状态，点了只重跑这一块 (不用再整页 st.rerun())，
+    样式、侧边栏、读进度、组题都不再跑一遍，浏览器也只收到卡片这部分的变化
+    """
+    toast = st.session_state.pop("toast", None)
+    if toast: st.toast(toast, icon="🔥")
+    if not st.session_state.deck:
+        st.success("🎉 恭喜！当前题库已全部斩杀！")
+        if st.button("🔄 重置"):
+            st.cache_data.clear()
+            st.rerun()  # 整页重跑，侧边栏重新组题
+        return
 
-    plant_data = {"name_cn": curr['name']}
+    curr = st.session_state.deck.current()
 
-    # 🌟 1. 智能搜图 (API) 模式
-    if curr['type'] == 'api':
-        user_provided = curr.get("user_info", {})
+    # --- 🧠 核心数据获取 (终极逻辑) ---
+    if (st.session_state.current_plant_data is None or
+            st.session_state.current_plant_data.get('name_cn') != curr['name']):
 
-        # 如果用户提供了学名，这非常宝贵！我们用它来搜图，准度Max！
-        # 但我们不需要再去查文本资料了，因为用户已经提供了
-        if user_provided.get("scientific_name"):
-            with st.spinner(f"正在根据学名 [{user_provided['scientific_name']}] 搜图..."):
-                # 只搜图，不覆盖文本
-                # 这里的 fetch_plant_info 会优先用学名搜
-                info = plant_expert.fetch_plant_info(user_provided['scientific_name'])
+        plant_data = {"name_cn": curr['name']}
 
-                # 构造数据：用户提供的文本 + 网上搜到的图
-                plant_data.update(user_provided)  # 文本信用户的
-                if info and info.get('image_url'):
-                    plant_data['image_url'] = info['image_url']  # 图用网上的
-                else:
-                    plant_data['error'] = False  # 即使没图也不算错，只要有文本就行
-
-        # 如果用户啥都没提供，那就全网裸搜
-        else:
+        # 🌟 1. 智能搜图 (API) 模式 (后台预取过的直接拿)
+        if curr['type'] == 'api':
             with st.spinner("🧬 正在连接全球数据库..."):
-                info = plant_expert.fetch_plant_info(curr['name'])
-                if info:
-                    plant_data.update(info)
-                else:
-                    plant_data["error"] = True
+                plant_data = st.session_state.prefetcher.get(curr)
 
-    # 🌟 2. 本地/ZIP 模式
-    else:
-        plant_data["local"] = True
-        plant_data["image_path"] = curr['image_path']
-        info_path = os.path.join(curr['folder_path'], "info.txt")
-
-        # 读取本地文件
-        if os.path.exists(info_path):
+        # 🌟 2. 本地/ZIP 模式
+        else:
+            if curr['type'] == 'zip':
+                # ZIP 包：解压这一张图和 info.txt (后台可能已经解压好了)
+                plant_data = st.session_state.prefetcher.get(curr)
+            else:
+                # 系统题库的 info.txt 已经在索引里解析好了
+                plant_data["local"] = True
+                plant_data["image_path"] = random.choice(curr['images'])
+                plant_data.update(curr["info"])
+
+            # 补漏逻辑
+            # 如果本地文件里有有效数据，我们就不联网了！
+            has_data = plant_data.get("family_cn") or plant_data.get("scientific_name")
+
+            if not has_data:
+                with st.spinner(f"正在云端补全 {curr['name']} 的科属信息..."):
+                    import plant_expert
+
+                    # 先查字典
+                    if curr['name'] in plant_expert.CUSTOM_DICTIONARY:
+                        entry = plant_expert.CUSTOM_DICTIONARY[curr['name']]
+                        if isinstance(entry, dict):
+                            plant_data.update({
+                                "scientific_name": entry['latin'],
+                                "family_cn": entry['family'],
+                                "genus_cn": entry['genus']
+                            })
+
+                    # 再查网
+                    if not plant_data.get("scientific_name"):
+                        online_info = plant_expert.fetch_plant_info(curr['name'])
+                        if online_info: plant_data.update(online_info)
+
+        st.session_state.current_plant_data = plant_data
+
+    # API / ZIP 模式：趁用户看这张的时候，后台把后面几张准备好
+    if curr['type'] in ('api', 'zip'):
+        st.session_state.prefetcher.schedule(st.session_state.deck.upcoming(prefetch.PREFETCH_AHEAD))
+
+    data = st.session_state.current_plant_data
+
+    with st.container():
+        c_img, c_info = st.columns([1.5, 1])
+        with c_img:
             try:
-                with open(info_path, "r", encoding="utf-8") as f:
-                    for line in f:
-                        if ":" in line:
-                            key, val = line.split(":", 1)
-                            key, val = key.strip(), val.strip()
-                            if "Bing" in val or "未知" in val: continue
-                            if "学名" in key and contains_chinese(val): continue
-                            if "学名" in key: plant_data["scientific_name"] = val
-                            if "科" in key: plant_data["family_cn"] = val  # 本地info里通常直接是中文
-                            if "属" in key: plant_data["genus_cn"] = val
+                if data.get("error"):
+                    st.error("📡 暂无数据")
+                elif data.get("local"):
+                    html = local_image_html(data['image_path'])
+                    if html:
+                        st.markdown(html, unsafe_allow_html=True)
+                    else:
+                        # 没有小图就交给 Streamlit 直接读文件，不经过 PIL 重新编码
+                        st.image(data['image_path'], use_container_width=True)
+                elif data.get("image_bytes"):
+                    st.image(data['image_bytes'], use_container_width=True)
+                elif data.get("image_file"):
+                    st.image(data['image_file'], use_container_width=True)
+                else:
+                    st.warning("🖼️ 无图片")
             except:
-                pass
-
-        # 补漏逻辑
-        # 如果本地文件里有有效数据，我们就不联网了！
-        has_data = plant_data.get("family_cn") or plant_data.get("scientific_name")
-
-        if not has_data:
-            with st.spinner(f"正在云端补全 {curr['name']} 的科属信息..."):
-                # 先查字典
-                if curr['name'] in plant_expert.CUSTOM_DICTIONARY:
-                    entry = plant_expert.CUSTOM_DICTIONARY[curr['name']]
-                    if isinstance(entry, dict):
-                        plant_data.update({
-                            "scientific_name": entry['latin'],
-                            "family_cn": entry['family'],
-                            "genus_cn": entry['genus']
-                        })
-
-                # 再查网
-                if not plant_data.get("scientific_name"):
-                    online_info = plant_expert.fetch_plant_info(curr['name'])
-                    if online_info: plant_data.update(online_info)
-
-    st.session_state.current_plant_data = plant_data
-
-data = st.session_state.current_plant_data
-
-with st.container():
-    c_img, c_info = st.columns([1.5, 1])
-    with c_img:
-        try:
-            if data.get("error"):
-                st.error("📡 暂无数据")
-            elif data.get("local"):
-                st.image(Image.open(data['image_path']), use_container_width=True)
-            elif data.get("image_url"):
-                st.image(data['image_url'], use_container_width=True)
-            else:
-                st.warning("🖼️ 无图片")
-        except:
-            st.error("图片加载失败")
-    with c_info:
-        st.write(f"#### 📝 剩余：{len(st.session_state.quiz_list)}")
-        st.progress((st.session_state.mastered_count % 100) / 100)
-        st.caption(f"已斩杀：{st.session_state.mastered_count}")
-        st.markdown("---")
-
-        if st.session_state.show_answer:
-            st.markdown(f"## ✅ {data.get('name_cn')}")
-
-            # 显示逻辑
-            fam_cn = data.get('family_cn')
-            fam_la = data.get('family')
-            gen_cn = data.get('genus_cn')
-            gen_la = data.get('genus')
-            sci_nm = data.get('scientific_name')
-
-            # 来源标注
-            source_tag = "数据来源: 未知"
-            if data.get('user_info'):
-                source_tag = "数据来源: 用户上传"
-            elif fam_cn:
-                source_tag = "数据来源: Wikidata/人工校验"
-            elif fam_la:
-                source_tag = "数据来源: GBIF (未汉化)"
-
-            # 只要有数据就显示
-            if fam_cn or fam_la or gen_cn or sci_nm:
-                f_show = fam_cn if fam_cn else (fam_la if fam_la else "未知")
-                g_show = gen_cn if gen_cn else (gen_la if gen_la else "未知")
-                s_show = sci_nm if sci_nm and not contains_chinese(sci_nm) else "未知"
-
-                # 如果有拉丁，加括号显示
-                if fam_la and fam_cn != fam_la: f_show += f" ({fam_la})"
-                if gen_la and gen_cn != gen_la: g_show += f" ({gen_la})"
-
-                st.markdown(f"""
-                <div class="info-box">
-                <b>科 (Family):</b> {f_show} <br>
-                <b>属 (Genus):</b> {g_show} <br>
-                <b>学名:</b> <i>{s_show}</i>
-                <span class="source-tag">{source_tag}</span>
-                </div>
-                """, unsafe_allow_html=True)
+                st.error("图片加载失败")
+        with c_info:
+            st.write(f"#### 📝 剩余：{len(st.session_state.deck)}")
+            st.progress((st.session_state.mastered_count % 100) / 100)
+            st.caption(f"已斩杀：{st.session_state.mastered_count}")
+            st.markdown("---")
+
+            if st.session_state.show_answer:
+                st.markdown(f"## ✅ {data.get('name_cn')}")
+
+                # 显示逻辑
+                fam_cn = data.get('family_cn')
+                fam_la = data.get('family')
+                gen_cn = data.get('genus_cn')
+                gen_la = data.get('genus')
+                sci_nm = data.get('scientific_name')
+
+                # 来源标注
+                source_tag = "数据来源: 未知"
+                if data.get('user_info'):
+                    source_tag = "数据来源: 用户上传"
+                elif fam_cn:
+                    source_tag = "数据来源: Wikidata/人工校验"
+                elif fam_la:
+                    source_tag = "数据来源: GBIF (未汉化)"
+
+                # 只要有数据就显示
+                if fam_cn or fam_la or gen_cn or sci_nm:
+                    f_show = fam_cn if fam_cn else (fam_la if fam_la else "未知")
+                    g_show = gen_cn if gen_cn else (gen_la if gen_la else "未知")
+                    s_show = sci_nm if sci_nm and not catalog.contains_chinese(sci_nm) else "未知"
+
+                    # 如果有拉丁，加括号显示
+                    if fam_la and fam_cn != fam_la: f_show += f" ({fam_la})"
+                    if gen_la and gen_cn != gen_la: g_show += f" ({gen_la})"
+
+                    st.markdown(f"""
+                    <div class="info-box">
+                    <b>科 (Family):</b> {f_show} <br>
+                    <b>属 (Genus):</b> {g_show} <br>
+                    <b>学名:</b> <i>{s_show}</i>
+                    <span class="source-tag">{source_tag}</span>
+                    </div>
+                    """, unsafe_allow_html=True)
+                else:
+                    st.info("🤖 暂无专业科属数据")
             else:
-                st.info("🤖 暂无专业科属数据")
-        else:
-            st.markdown("### ❓  ?????")
-            st.caption("看着图片，大声说出它的名字！")
-
-st.markdown("---")
-b1, b2, b3, b4 = st.columns([1, 1, 1, 1.2])
-with b1:
-    disable_back = len(st.session_state.history) == 0
-    if st.button("⬅️ 上一个", use_container_width=True, disabled=disable_back):
-        go_back()
-        st.rerun()
-with b2:
-    if st.button("👀 看答案", use_container_width=True):
-        st.session_state.show_answer = True
-        st.rerun()
-with b3:
-    if st.button("➡️ 下一个", use_container_width=True):
-        go_next()
-        st.rerun()
-with b4:
-    if st.button("⚔️ 斩 杀", type="primary", use_container_width=True):
-        do_master(user_name, curr['name'])
-        st.rerun()
\ No newline at end of file
+                st.markdown("### ❓  ?????")
+                st.caption("看着图片，大声说出它的名字！")
+
+    st.markdown("---")
+    b1, b2, b3, b4 = st.columns([1, 1, 1, 1.2])
+    with b1:
+        disable_back = len(st.session_state.history) == 0
+        st.button("⬅️ 上一个", use_container_width=True, disabled=disable_back, on_click=go_back)
+    with b2:
+        st.button("👀 看答案", use_container_width=True, on_click=show_answer)
+    with b3:
+        st.button("➡️ 下一个", use_container_width=True, on_click=go_next)
+    with b4:
+        st.button("⚔️ 斩 杀", type="primary", use_container_width=True, on_click=do_master, args=(user_name, curr['name']))
+
+
+quiz_card(user_name)
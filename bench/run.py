@@ -0,0 +1,263 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import zipfile
+import platform
+import tempfile
+import statistics
+import contextlib
+import subprocess
+
+from bench import startup, stub_server
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# 合成题库的规模 (扫描 / 索引 / ZIP 用)
+TREE_PLANTS = 500
+TREE_IMAGES = 3
+# 压缩测试用几张多大的图
+COMPRESS_IMAGES = 24
+COMPRESS_SIZE = (2400, 1800)
+# TXT 名单多少行
+TXT_LINES = 100000
+
+
+def percentiles(samples):
+    """延迟统计 (毫秒)"""
+    ms = sorted(s * 1000 for s in samples)
+    if not ms: return {}
+    cuts = statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+    return {"n": len(ms), "mean_ms": round(statistics.mean(ms), 3), "p50_ms": round(cuts[49], 3),
+            "p90_ms": round(cuts[89], 3), "p99_ms": round(cuts[98], 3), "max_ms": round(ms[-1], 3)}
+
+
+def timed(func, repeat=3):
+    """跑 repeat 次取最快的一次 (秒)，顺便把最后一次的返回值带出来"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def quiet():
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+# ==========================================
+# 🧪 各项测试
+# ==========================================
+
+def bench_fetch(workdir, latency, jitter, error_rate, rounds, keep_rate_limits):
+    """fetch_plant_info 的延迟分布：替身服务器回放录好的响应，先冷缓存跑一轮，再热缓存跑 rounds 轮"""
+    import plant_cache
+    import transport
+    import plant_expert
+
+    plant_cache.CACHE_PATH = os.path.join(workdir, "plant_cache.sqlite3")
+    stub = stub_server.StubServer(latency=latency, jitter=jitter, error_rate=error_rate, seed=1)
+    names = stub_server.load_fixtures().get("names", [])
+    if not keep_rate_limits:
+        transport.configure(rate_limits={host: (1e6, 1e6) for host in transport.RATE_LIMITS})
+    transport.configure(host_overrides={"*": stub.start()})
+    try:
+        cold = []
+        for name in names:
+            start = time.perf_counter()
+            plant_expert.fetch_plant_info(name, verbose=False)
+            cold.append(time.perf_counter() - start)
+        warm = []
+        for _ in range(rounds):
+            for name in names:
+                start = time.perf_counter()
+                plant_expert.fetch_plant_info(name, verbose=False)
+                warm.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        list(plant_expert.fetch_plant_info_many(names))
+        many = time.perf_counter() - start
+    finally:
+        stub.stop()
+        transport.configure(host_overrides={})
+    missed = stub.stats["default"] + stub.stats["unknown"]
+    if missed:
+        # 回放默认空结果的请求走的不是真实路径，测出来的数不作数
+        raise RuntimeError(f"{missed} 个请求没有录好的响应，请重录 fixtures "
+                           f"(python -m bench.stub_server record 名单.txt --fresh)：{list(stub.missed)[:5]}")
+    return {"names": len(names), "cold": percentiles(cold), "warm": percentiles(warm),
+            "many_warm_s": round(many, 4), "stub": dict(stub.stats)}
+
+
+def make_tree(root, plants=TREE_PLANTS, images=TREE_IMAGES):
+    """合成一个题库目录：plants 个文件夹，每个 images 张小图 + info.txt"""
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 480), (46, 125, 50)).save(buf, "JPEG", quality=70)
+    jpeg = buf.getvalue()
+    for i in range(plants):
+        folder = os.path.join(root, f"植物{i:04d}")
+        os.makedirs(folder, exist_ok=True)
+        for j in range(images):
+            with open(os.path.join(folder, f"{j}.jpg"), "wb") as f: f.write(jpeg)
+        with open(os.path.join(folder, "info.txt"), "w", encoding="utf-8") as f:
+            f.write(f"中文名: 植物{i:04d}\n学名: Genus species{i}\n科: 蔷薇科\n属: 蔷薇属\n")
+    return root
+
+
+def bench_deck(workdir):
+    """系统题库扫描 / 生成索引 / 读索引，以及同样内容的 ZIP 包建索引"""
+    import catalog
+    import zip_deck
+
+    root = make_tree(os.path.join(workdir, "tree", "common"))
+    roots = (root,)
+    index = os.path.join(workdir, "catalog.jsonl")
+    scan_s, entries = timed(lambda: catalog.scan(roots))
+    build_s, _ = timed(lambda: catalog.build(roots, index))
+    load_s, _ = timed(lambda: catalog.load(roots, index), repeat=5)
+
+    archive = os.path.join(workdir, "deck.zip")
+    with zipfile.ZipFile(archive, "w") as z:
+        for folder, _, files in os.walk(root):
+            for file in files:
+                z.write(os.path.join(folder, file), os.path.relpath(os.path.join(folder, file), os.path.dirname(root)))
+    zip_s, pack = timed(lambda: zip_deck.ZipDeck(archive), repeat=5)
+    card = pack.cards()[0]
+    card_s, _ = timed(lambda: pack.load_card(card), repeat=20)
+    return {"plants": len(entries), "images": sum(len(e["images"]) for e in entries),
+            "scan_s": round(scan_s, 4), "build_s": round(build_s, 4), "load_s": round(load_s, 5),
+            "zip_index_s": round(zip_s, 5), "zip_card_s": round(card_s, 6)}
+
+
+def bench_parse(lines=TXT_LINES):
+    """上传名单的解析速度"""
+    import deck
+
+    rnd = random.Random(1)
+    rows = []
+    for i in range(lines):
+        if rnd.random() < 0.3:
+            rows.append(f"植物{i}#蔷薇科#蔷薇属#Rosa species{i}")
+        else:
+            rows.append(f"  植物{i}  ")
+    content = "\n".join(rows)
+    seconds, cards = timed(lambda: deck.parse_txt_content(content))
+    return {"lines": lines, "cards": len(cards), "seconds": round(seconds, 4),
+            "lines_per_s": round(lines / seconds)}
+
+
+def bench_compress(workdir, count=COMPRESS_IMAGES, size=COMPRESS_SIZE):
+    """compress_images 的吞吐量：第一遍真压缩，第二遍应该全靠清单跳过"""
+    from PIL import Image
+    import compress_images
+
+    folder = os.path.join(workdir, "compress")
+    os.makedirs(folder, exist_ok=True)
+    rnd = random.Random(1)
+    for i in range(count):
+        img = Image.linear_gradient("L").resize(size).convert("RGB")
+        img.paste((rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)), (0, 0, size[0] // 3, size[1] // 3))
+        img.save(os.path.join(folder, f"{i}.jpg"), "JPEG", quality=95)
+    before = sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder))
+
+    with quiet():
+        start = time.perf_counter()
+        compress_images.compress_images(folder, force=True)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        compress_images.compress_images(folder)
+        second = time.perf_counter() - start
+    after = sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder) if f.endswith(".jpg"))
+    return {"images": count, "input_mb": round(before / 1e6, 2), "output_mb": round(after / 1e6, 2),
+            "seconds": round(first, 3), "images_per_s": round(count / first, 2),
+            "mb_per_s": round(before / 1e6 / first, 2), "rerun_s": round(second, 4)}
+
+
+# ==========================================
+# 📊 汇总 / 对比
+# ==========================================
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def _flatten(data, prefix=""):
+    for key, value in data.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield prefix + key, value
+
+
+def compare(old_path, new_path):
+    """两次结果逐项对比"""
+    with open(old_path, "r", encoding="utf-8") as f: old = dict(_flatten(json.load(f)["results"]))
+    with open(new_path, "r", encoding="utf-8") as f: new = dict(_flatten(json.load(f)["results"]))
+    for key in sorted(old.keys() | new.keys()):
+        a, b = old.get(key), new.get(key)
+        ratio = f"x{b / a:.2f}" if a and b is not None else ""
+        print(f"{key:32s} {a!s:>12} -> {b!s:<12} {ratio}")
+
+
+def main(argv):
+    def opt(flag, default):
+        return type(default)(argv[argv.index(flag) + 1]) if flag in argv else default
+
+    if "--compare" in argv:
+        i = argv.index("--compare")
+        return compare(argv[i + 1], argv[i + 2])
+
+    only = set(opt("--only", "fetch,deck,parse,compress,startup").split(","))
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="plant-bench-")
+    try:
+        if "fetch" in only:
+            print("🌐 fetch_plant_info (替身服务器)...", flush=True)
+            results["fetch"] = bench_fetch(workdir, opt("--latency", 0.05), opt("--jitter", 0.02),
+                                           opt("--error-rate", 0.0), opt("--rounds", 3), "--keep-rate-limits" in argv)
+        if "deck" in only:
+            print("📂 题库扫描 / 索引 / ZIP...", flush=True)
+            results["deck"] = bench_deck(workdir)
+        if "parse" in only:
+            print("📄 TXT 名单解析...", flush=True)
+            results["parse"] = bench_parse()
+        if "compress" in only:
+            print("🗜️ 图片压缩...", flush=True)
+            results["compress"] = bench_compress(workdir)
+        if "startup" in only:
+            print("⏱️ App 冷启动 (-X importtime)...", flush=True)
+            results["startup"] = startup.measure(opt("--startup-rounds", 3))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"env": environment(), "args": argv, "results": results}
+    out = opt("--out", os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json"))
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"🎉 结果已保存：{out}")
+
+
+if __name__ == '__main__':
+    # 在仓库根目录运行 (不需要联网)：
+    #   python -m bench.run                                   全部跑一遍
+    #   python -m bench.run --only fetch --latency 0.2 --error-rate 0.1
+    #   python -m bench.run --only startup --startup-rounds 5       首屏时间 / 首屏加载了哪些重模块
+    #   python -m bench.run --compare bench/results/a.json bench/results/b.json
+    main(sys.argv[1:])
@@ -0,0 +1,72 @@
+import os
+import re
+import sys
+import json
+import time
+import subprocess
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 首屏不该加载的重模块：出现在首屏的导入记录里就算退化
+HEAVY = ("pandas", "PIL", "requests", "streamlit_gsheets", "plant_expert", "download_gbif")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(text):
+    """-X importtime 的输出 -> [(嵌套深度, 模块, 累计微秒)]，深度 0 是直接被 App 导入的"""
+    rows = []
+    for line in text.splitlines():
+        m = _LINE.match(line)
+        if m: rows.append(((len(m.group(3)) - 1) // 2, m.group(4), int(m.group(2))))
+    return rows
+
+
+def _child():
+    """子进程里跑：先把 streamlit 测试框架导入好 (不算在 App 头上)，再量首屏和登录后的渲染"""
+    from streamlit.testing.v1 import AppTest
+
+    print("--- app ---", file=sys.stderr, flush=True)
+    start = time.perf_counter()
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    at.run()
+    first = time.perf_counter() - start
+    loaded_first = sorted(m for m in HEAVY if m in sys.modules)
+    print("--- login ---", file=sys.stderr, flush=True)
+    start = time.perf_counter()
+    at.sidebar.text_input[0].input("startup-bench").run()
+    login = time.perf_counter() - start
+    print(json.dumps({"first_render_s": round(first, 4), "login_render_s": round(login, 4),
+                      "heavy_loaded_at_first_render": loaded_first}))
+
+
+def measure(rounds=3):
+    """
+    冷启动：每轮一个全新的 Python 进程 (-X importtime)，取首屏最快的一轮。
+    返回首屏 / 登录后渲染时间，两段各自的导入总耗时和最慢的几个模块。
+    """
+    best = None
+    for _ in range(rounds):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-m", "bench.startup", "--child"], cwd=ROOT,
+                              capture_output=True, text=True)
+        if proc.returncode != 0: raise RuntimeError(proc.stderr[-2000:])
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        first, login = proc.stderr.split("--- app ---", 1)[-1].split("--- login ---", 1)
+        for label, text in (("first_render", first), ("login", login)):
+            top = [(name, us) for depth, name, us in parse_importtime(text) if depth == 0]
+            result[f"{label}_import_ms"] = round(sum(us for _, us in top) / 1000, 1)
+            result[f"{label}_slowest_imports_ms"] = {name: round(us / 1000, 1)
+                                                     for name, us in sorted(top, key=lambda t: -t[1])[:5]}
+        if best is None or result["first_render_s"] < best["first_render_s"]: best = result
+    return best
+
+
+if __name__ == '__main__':
+    # 用法：python -m bench.startup      (在仓库根目录运行，也会作为 python -m bench.run --only startup 的一项)
+    if "--child" in sys.argv:
+        _child()
+    else:
+        print(json.dumps(measure(), ensure_ascii=False, indent=2))
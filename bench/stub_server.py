@@ -0,0 +1,187 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "responses.json")
+ERROR_STATUS = (429, 503)  # 注入错误时随机返回其中一个
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+def request_key(host, path, query):
+    """同一个请求不管参数顺序都得到同一个键：host + path + 排好序的参数"""
+    return f"{host}{path}?{urlencode(sorted(parse_qsl(query, keep_blank_values=True)))}"
+
+
+def load_fixtures(path=FIXTURES_PATH):
+    if not os.path.exists(path): return {"responses": {}, "defaults": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _placeholder_jpeg():
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new("RGB", (800, 600), (46, 125, 50)).save(buf, "JPEG", quality=70)
+    return buf.getvalue()
+
+
+class StubServer:
+    """
+    本地替身服务器：按录好的响应回放 GBIF / iNat / Wikidata / Wikimedia / Bing，
+    可以加延迟 (latency ± jitter 秒) 和按比例注入 429 / 503。
+    配合 transport.configure(host_overrides={"*": server.url}) 使用，原域名从 X-Original-Host 头里拿。
+    没录到的请求返回该接口的默认空结果，图片地址一律返回一张占位 JPEG。
+    """
+
+    def __init__(self, fixtures_path=FIXTURES_PATH, latency=0.0, jitter=0.0, error_rate=0.0, port=0, seed=None):
+        fixtures = load_fixtures(fixtures_path)
+        self.responses = fixtures.get("responses", {})
+        self.defaults = fixtures.get("defaults", {})
+        self.latency, self.jitter, self.error_rate = latency, jitter, error_rate
+        self.random = random.Random(seed)
+        self.stats = Counter()
+        self.missed = Counter()  # 没录到的请求键 -> 次数 (回放了默认结果或 404)
+        self.lock = threading.Lock()
+        self.image = None
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                status, content_type, body = stub.respond(self.headers.get("X-Original-Host", ""), self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # 客户端过了截止时间先断开了
+
+        return Handler
+
+    def respond(self, host, raw_path):
+        """返回 (状态码, Content-Type, 响应体 bytes)"""
+        with self.lock:
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            fail = self.random.random() < self.error_rate
+            status = self.random.choice(ERROR_STATUS)
+        if delay: time.sleep(delay)
+        if fail:
+            self.stats["error"] += 1
+            return status, "text/plain", b""
+
+        parts = urlsplit(raw_path)
+        if parts.path.lower().endswith(IMAGE_EXTS):
+            self.stats["image"] += 1
+            if self.image is None: self.image = _placeholder_jpeg()
+            return 200, "image/jpeg", self.image
+
+        key = request_key(host, parts.path, parts.query)
+        record = self.responses.get(key)
+        if record is None:
+            record = self.defaults.get(host + parts.path)
+            with self.lock:
+                self.stats["default" if record else "unknown"] += 1
+                self.missed[key] += 1
+            if record is None: return 404, "text/plain", b""
+        else:
+            self.stats["replayed"] += 1
+        return record.get("status", 200), record.get("type", "application/json"), record["body"].encode("utf-8")
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="stub-server", daemon=True)
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def record(names, path=FIXTURES_PATH, fresh=False):
+    """
+    联网把一批名字真查一遍 (逐个查 + 整批查，和跑分一样)，录下 plant_expert 发出的每个请求的响应，
+    合并进 fixtures 文件 (名字也记进去，跑分默认就查这些名字)。
+    录的时候不走缓存，保证每个请求都真的发出去。
+    fresh: 先丢掉旧的响应 (请求参数改了以后重录，免得留着对不上的旧键)
+    """
+    import transport
+    import plant_cache
+    import plant_expert
+
+    fixtures = load_fixtures(path)
+    if fresh: fixtures["responses"] = {}
+    responses = fixtures.setdefault("responses", {})
+    original = transport.get
+    lock = threading.Lock()
+
+    def recording_get(url, **kwargs):
+        response = original(url, **kwargs)
+        if kwargs.get("stream"): return response  # 图片下载不录
+        parts = urlsplit(url)
+        key = request_key(parts.hostname, parts.path, urlencode(kwargs.get("params") or {}, doseq=True))
+        with lock:
+            responses[key] = {"status": response.status_code,
+                              "type": response.headers.get("Content-Type", "application/json"),
+                              "body": response.text}
+        return response
+
+    transport.get = recording_get
+    plant_cache.CACHE_ENABLED = False
+    try:
+        for name in names:
+            print(f"🎙️ {name}", flush=True)
+            plant_expert.fetch_plant_info(name, verbose=False)
+        print("🎙️ (整批)", flush=True)
+        list(plant_expert.fetch_plant_info_many(names))
+    finally:
+        transport.get = original
+
+    fixtures["names"] = list(dict.fromkeys(fixtures.get("names", []) + list(names)))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixtures, f, ensure_ascii=False, indent=1, sort_keys=True)
+    print(f"🎉 已录 {len(responses)} 条响应 -> {path}")
+
+
+if __name__ == '__main__':
+    # 用法：
+    #   python -m bench.stub_server serve [端口] [延迟秒] [错误率]
+    #       然后 PLANT_HOST_OVERRIDE="*=http://127.0.0.1:端口" streamlit run app.py 就能离线点 App
+    #   python -m bench.stub_server record 名单.txt [--fresh]   (要联网；--fresh 丢掉旧的响应重录)
+    args = sys.argv[1:]
+    if args and args[0] == "record":
+        with open(args[1], "r", encoding="utf-8") as f:
+            record([line.split("#")[0].strip() for line in f if line.strip()], fresh="--fresh" in args)
+    else:
+        port = int(args[1]) if len(args) > 1 else 8765
+        stub = StubServer(port=port, latency=float(args[2]) if len(args) > 2 else 0.0,
+                          error_rate=float(args[3]) if len(args) > 3 else 0.0)
+        print(f"🧪 替身服务器已启动：{stub.url}  (Ctrl+C 退出)")
+        try:
+            stub.server.serve_forever()
+        except KeyboardInterrupt:
+            stub.stop()
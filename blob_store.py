@@ -0,0 +1,233 @@
+import os
+import json
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+import catalog
+import compress_images
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+# 按内容哈希存的图片：blobs/ab/abcdef....jpg。植物文件夹里的图和 blob 是同一个文件 (硬链接)，
+# 内容一样的图在磁盘上只占一份。整个目录删了也没关系，植物文件夹里的图还在，再跑一遍就重建。
+BLOB_DIR = os.environ.get("PLANT_BLOB_DIR", os.path.join("cache", "blobs"))
+MANIFEST_PATH = os.path.join(BLOB_DIR, "manifest.json")  # 相对路径 -> 内容哈希，外加每个哈希的感知哈希
+
+# 要去重的目录：原图 + 离线生成的小图 (同一张原图生成的小图也一样)
+ROOTS = ("images", compress_images.DERIVED_DIR)
+IMAGE_EXTS = catalog.IMAGE_EXTS + (".webp",)
+
+HASH_SIZE = 8  # dHash 8x8 = 64 位
+NEAR_THRESHOLD = 6  # 汉明距离不超过这个算“几乎一样”
+
+
+def blob_path(digest, ext=".jpg"):
+    return os.path.join(BLOB_DIR, digest[:2], digest + ext)
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path): return {"files": {}, "dhash": {}}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except ValueError:
+        return {"files": {}, "dhash": {}}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=0, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def iter_images(roots=ROOTS):
+    for root in roots:
+        for folder, _, files in os.walk(root):
+            for file in sorted(files):
+                if file.lower().endswith(IMAGE_EXTS): yield os.path.join(folder, file)
+
+
+# ==========================================
+# 🧱 内容去重 (完全一样的文件)
+# ==========================================
+
+def _link(src, dst):
+    """让 dst 变成 src 的硬链接 (先链到临时名再原子替换，中途出错原文件不受影响)"""
+    tmp = dst + ".link"
+    if os.path.exists(tmp): os.remove(tmp)
+    os.link(src, tmp)
+    os.replace(tmp, dst)
+
+
+def store(path, digest=None):
+    """
+    把一个文件收进 blob 库：库里还没有就把它本身链进去；已经有了就把它换成库里那份的硬链接。
+    返回 (哈希, 省下的字节数)；文件系统不支持硬链接时原样保留，省下 0。
+    """
+    digest = digest or compress_images.file_sha1(path)
+    blob = blob_path(digest, os.path.splitext(path)[1].lower())
+    try:
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.link(path, blob)
+            return digest, 0
+        if os.path.samefile(path, blob): return digest, 0
+        size = os.path.getsize(path)
+        _link(blob, path)
+        return digest, size
+    except OSError:
+        return digest, 0
+
+
+def dedupe(roots=ROOTS, dry_run=False):
+    """
+    扫一遍所有图片，内容完全一样的合并成同一个文件 (硬链接)。
+    dry_run: 只统计能省多少，不动文件。返回统计 Counter
+    """
+    manifest = load_manifest()
+    files = {}
+    stats = Counter()
+    seen = {}
+    for path in iter_images(roots):
+        digest = compress_images.file_sha1(path)
+        stats["files"] += 1
+        if digest in seen:
+            stats["duplicates"] += 1
+            if dry_run:
+                if not os.path.samefile(path, seen[digest]): stats["saved_bytes"] += os.path.getsize(path)
+            else:
+                stats["saved_bytes"] += store(path, digest)[1]
+        else:
+            seen[digest] = path
+            if not dry_run: store(path, digest)
+        files[path.replace(os.sep, "/")] = digest
+    stats["blobs"] = len(seen)
+
+    if not dry_run:
+        manifest["files"] = files
+        save_manifest(manifest)
+        stats["removed_blobs"] = gc()
+    return stats
+
+
+def gc():
+    """删掉没有任何植物文件夹在用的 blob (硬链接数只剩 1 的就是只有库里这一份)"""
+    removed = 0
+    for folder, _, names in os.walk(BLOB_DIR):
+        for name in names:
+            path = os.path.join(folder, name)
+            if name == os.path.basename(MANIFEST_PATH) or name.endswith(".tmp"): continue
+            try:
+                if os.stat(path).st_nlink == 1:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+# ==========================================
+# 🔍 感知哈希 (几乎一样的图：缩放、重新压缩、轻微裁剪)
+# ==========================================
+
+def dhash(path, size=HASH_SIZE):
+    """差值哈希：缩成 (size+1) x size 的灰度图，比较左右相邻像素的明暗，得到 size*size 位的整数"""
+    with Image.open(path) as img:
+        img.draft("L", (size * 8, size * 8))  # JPEG 直接按小尺寸解码，快很多
+        pixels = list(img.convert("L").resize((size + 1, size), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            bits = (bits << 1) | (left > pixels[row * (size + 1) + col + 1])
+    return bits
+
+
+def _dhash_one(path):
+    try:
+        return dhash(path)
+    except Exception:
+        return None
+
+
+def _bands(bits, parts, width=HASH_SIZE * HASH_SIZE):
+    """把哈希切成 parts 段：距离不超过 parts-1 的两张图至少有一段完全相同 (抽屉原理)"""
+    step = -(-width // parts)
+    return [(i, (bits >> (i * step)) & ((1 << step) - 1)) for i in range(parts)]
+
+
+def near_duplicates(roots=(os.path.join("images", "common"), os.path.join("images", "important")),
+                    threshold=NEAR_THRESHOLD, workers=None):
+    """
+    找整个图库里几乎一样的图，返回分组列表，每组是 [相对路径, ...] (只列有 2 个以上不同植物文件夹的组)。
+    内容完全一样的文件只算一次哈希；算过的感知哈希存在清单里，下次直接用。
+    """
+    manifest = load_manifest()
+    known = manifest.setdefault("dhash", {})
+    by_digest = defaultdict(list)
+    for path in iter_images(roots):
+        by_digest[compress_images.file_sha1(path)].append(path)
+
+    todo = [d for d in by_digest if d not in known]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for digest, bits in zip(todo, pool.map(_dhash_one, [by_digest[d][0] for d in todo], chunksize=16)):
+            known[digest] = None if bits is None else format(bits, "x")
+    save_manifest(manifest)
+
+    # 分段建桶，只比较至少一段相同的候选对，不用两两全比
+    digests = [d for d in by_digest if known.get(d)]
+    hashes = {d: int(known[d], 16) for d in digests}
+    buckets = defaultdict(list)
+    for d in digests:
+        for band in _bands(hashes[d], threshold + 1):
+            buckets[band].append(d)
+
+    parent = {d: d for d in digests}
+
+    def find(d):
+        while parent[d] != d:
+            parent[d] = parent[parent[d]]
+            d = parent[d]
+        return d
+
+    for group in buckets.values():
+        for i, a in enumerate(group):
+            for b in group[i + 1:]:
+                if find(a) != find(b) and bin(hashes[a] ^ hashes[b]).count("1") <= threshold:
+                    parent[find(a)] = find(b)
+    # 完全一样的文件本来就是一组
+    clusters = defaultdict(list)
+    for d in digests:
+        clusters[find(d)].extend(by_digest[d])
+    for d, paths in by_digest.items():
+        if d not in parent and len(paths) > 1: clusters[d].extend(paths)
+
+    result = []
+    for paths in clusters.values():
+        if len({os.path.dirname(p) for p in paths}) > 1:
+            result.append(sorted(p.replace(os.sep, "/") for p in paths))
+    return sorted(result)
+
+
+if __name__ == '__main__':
+    # 用法：python blob_store.py [--dry-run] [--scan-only] [--threshold N]
+    import sys
+
+    if "--scan-only" not in sys.argv:
+        dry_run = "--dry-run" in sys.argv
+        print("🧱 开始合并内容相同的图片..." + (" (只统计)" if dry_run else ""))
+        s = dedupe(dry_run=dry_run)
+        print(f"🎉 {s['files']} 个文件，{s['blobs']} 份不同内容，重复 {s['duplicates']} 个，"
+              f"{'能' if dry_run else '已'}省 {s['saved_bytes'] / 1024 / 1024:.2f} MB")
+
+    threshold = NEAR_THRESHOLD
+    if "--threshold" in sys.argv: threshold = int(sys.argv[sys.argv.index("--threshold") + 1])
+    print(f"🔍 查找几乎一样的图 (汉明距离 <= {threshold})...")
+    groups = near_duplicates(threshold=threshold)
+    for paths in groups:
+        print("⚠️ " + "  |  ".join(paths))
+    print(f"共 {len(groups)} 组疑似重复/用错的图，请人工确认。")
@@ -0,0 +1,147 @@
+import os
+import json
+import hashlib
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+# 系统题库的目录，顺序就是 deck 的顺序
+LOCAL_ROOTS = (os.path.join("images", "common"), os.path.join("images", "important"))
+CATALOG_PATH = os.path.join("images", "catalog.jsonl")
+CATALOG_VERSION = 1
+
+IMAGE_EXTS = ('.jpg', '.png', '.jpeg')
+
+
+def contains_chinese(text):
+    if not text: return False
+    for char in text:
+        if '\u4e00' <= char <= '\u9fff': return True
+    return False
+
+
+def parse_info(text):
+    """解析 info.txt，只留有效的 学名 / 科 / 属 (跳过 Bing、未知、中文学名这种脏数据)"""
+    info = {}
+    for line in text.splitlines():
+        if ":" in line:
+            key, val = line.split(":", 1)
+            key, val = key.strip(), val.strip()
+            if "Bing" in val or "未知" in val: continue
+            if "学名" in key and contains_chinese(val): continue
+            if "学名" in key: info["scientific_name"] = val
+            if "科" in key: info["family_cn"] = val  # 本地info里通常直接是中文
+            if "属" in key: info["genus_cn"] = val
+    return info
+
+
+def read_info(folder):
+    path = os.path.join(folder, "info.txt")
+    if not os.path.exists(path): return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return parse_info(f.read())
+    except (OSError, UnicodeDecodeError):
+        return {}
+
+
+def _image_entry(path):
+    from PIL import Image  # 只有重建索引时才用得到，App 首屏不用加载 PIL
+
+    try:
+        with Image.open(path) as img:  # 只读文件头，不解码
+            w, h = img.size
+    except Exception:
+        w = h = None
+    return {"path": path, "w": w, "h": h}
+
+
+# ==========================================
+# 🏗️ 生成 / 读取目录索引
+# ==========================================
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def roots_stamp(roots=LOCAL_ROOTS):
+    """
+    题库有没有变：每个目录一个指纹，算进目录本身、每个植物文件夹和它的 info.txt 的修改时间。
+    增删植物、改 info.txt、文件夹里增删 / 替换图片 (下载都是写临时文件再改名) 都会变；
+    只有原地覆盖写同名图片不会变，那种情况手动跑一次 python catalog.py 重建索引。
+    """
+    stamp = {}
+    for root in roots:
+        if not os.path.isdir(root):
+            stamp[root] = None
+            continue
+        digest = hashlib.sha1(str(_mtime(root)).encode())
+        for name in sorted(os.listdir(root)):
+            folder = os.path.join(root, name)
+            digest.update(f"\0{name}\0{_mtime(folder)}\0{_mtime(os.path.join(folder, 'info.txt'))}".encode("utf-8"))
+        stamp[root] = digest.hexdigest()
+    return stamp
+
+
+def scan(roots=LOCAL_ROOTS):
+    """扫描题库目录，生成索引条目"""
+    entries = []
+    for root in roots:
+        if not os.path.isdir(root): continue
+        deck = os.path.basename(root)
+        for name in sorted(os.listdir(root)):
+            folder = os.path.join(root, name)
+            if not os.path.isdir(folder): continue
+            imgs = [_image_entry(os.path.join(folder, f)) for f in sorted(os.listdir(folder))
+                    if f.lower().endswith(IMAGE_EXTS)]
+            if not imgs: continue
+            entries.append({"name": name, "deck": deck, "folder": folder, "images": imgs, "info": read_info(folder)})
+    return entries
+
+
+def build(roots=LOCAL_ROOTS, path=CATALOG_PATH):
+    """重新扫描并写出索引文件 (JSON lines，第一行是元信息)"""
+    stamp = roots_stamp(roots)
+    entries = scan(roots)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"_meta": {"version": CATALOG_VERSION, "roots": stamp}}, ensure_ascii=False) + "\n")
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+    return entries
+
+
+def read(path=CATALOG_PATH):
+    """只读现成的索引文件，不检查新旧、不重建；没有或读不了返回 []"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            f.readline()  # 元信息
+            return [json.loads(line) for line in f if line.strip()]
+    except (OSError, ValueError):
+        return []
+
+
+def load(roots=LOCAL_ROOTS, path=CATALOG_PATH):
+    """读索引；索引不存在、版本不对或目录有变动就现场重建"""
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                meta = json.loads(f.readline()).get("_meta", {})
+                if meta.get("version") == CATALOG_VERSION and meta.get("roots") == roots_stamp(roots):
+                    return [json.loads(line) for line in f if line.strip()]
+            except ValueError:
+                pass
+    try:
+        return build(roots, path)
+    except OSError:
+        return scan(roots)  # 目录只读 (比如部署环境) 就只在内存里用
+
+
+if __name__ == '__main__':
+    entries = build()
+    print(f"🎉 索引生成完毕：{len(entries)} 种植物 -> {CATALOG_PATH}")
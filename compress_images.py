@@ -1,62 +1,229 @@
 import os
-from PIL import Image
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 
+# 清单文件：记录每张图压缩后的哈希和参数，下次没变的图直接跳过
+MANIFEST_NAME = ".compress_manifest.json"
 
-def compress_images(source_folder, quality=70, max_size=800):
+# 卡片用的小图 (离线生成)：放在 Streamlit 静态目录里，浏览器直接按宽度挑一张，Python 不用解码
+DERIVED_DIR = os.path.join("static", "derived")
+DERIVED_SIZES = (480, 800)
+DERIVED_FORMATS = (("webp", "WEBP"), ("jpg", "JPEG"))
+
+# IJG 标准亮度量化表 (quality=50)，用来估算 JPEG 的压缩质量
+_STD_LUMINANCE = [
+    16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56, 14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99,
+]
+
+
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def estimate_jpeg_quality(img):
+    """根据亮度量化表估算 JPEG 质量 (1-100)，不是 JPEG 返回 None"""
+    tables = getattr(img, "quantization", None)
+    if not tables or 0 not in tables: return None
+    scale = sum(tables[0]) * 100.0 / sum(_STD_LUMINANCE)
+    if scale <= 0: return 100
+    quality = (200 - scale) / 2 if scale <= 100 else 5000 / scale
+    return max(1, min(100, round(quality)))
+
+
+def load_manifest(source_folder):
+    path = os.path.join(source_folder, MANIFEST_NAME)
+    if not os.path.exists(path): return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def save_manifest(source_folder, manifest):
+    path = os.path.join(source_folder, MANIFEST_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=0, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _unchanged(file_path, entry, quality, max_size):
+    """清单里有记录、参数一样、文件也没动过 -> 不用再压"""
+    if not entry or entry.get("quality") != quality or entry.get("max_size") != max_size: return False
+    st = os.stat(file_path)
+    if st.st_size == entry.get("size") and st.st_mtime_ns == entry.get("mtime_ns"): return True
+    return file_sha1(file_path) == entry.get("sha1")
+
+
+def compress_one(file_path, quality=70, max_size=800):
     """
-    遍历文件夹，压缩所有图片。
+    压缩单张图片 (在子进程里跑)。
+    返回 (状态, 新路径, 原大小, 新大小, 错误信息)，状态: compressed / optimized / error
+    """
+    from PIL import Image  # App 只用 derivative_path，不用加载 PIL
+
+    try:
+        original_size = os.path.getsize(file_path)
+        with Image.open(file_path) as img:
+            is_png = img.format == "PNG"
+            est = estimate_jpeg_quality(img) if img.format == "JPEG" else None
+
+            # 已经够小、质量也不高于目标的 JPEG 不要再压，反复压只会越压越糊
+            if est is not None and est <= quality + 5 and max(img.size) <= max_size:
+                return "optimized", file_path, original_size, original_size, None
+
+            # 1. 修改尺寸 (如果太大)
+            if max(img.size) > max_size:
+                img.draft("RGB", (max_size, max_size))
+                img.thumbnail((max_size, max_size))
+
+            # 2. 转换并保存 (转为 RGB 防止 PNG 透明底报错)
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+
+            # 先存临时文件，比原图还大就不要了
+            new_filename = os.path.splitext(file_path)[0] + ".jpg"
+            tmp_path = new_filename + ".tmp"
+            img.save(tmp_path, "JPEG", quality=quality, optimize=True, progressive=True)
+
+        new_size = os.path.getsize(tmp_path)
+        if new_size >= original_size and not is_png:
+            os.remove(tmp_path)
+            return "optimized", file_path, original_size, original_size, None
+
+        os.replace(tmp_path, new_filename)
+        # 如果原文件是 png，删掉原来的 png，只留 jpg
+        if is_png and new_filename != file_path: os.remove(file_path)
+        return "compressed", new_filename, original_size, new_size, None
+    except Exception as e:
+        return "error", file_path, 0, 0, str(e)
+
+
+def compress_images(source_folder, quality=70, max_size=800, workers=None, force=False):
+    """
+    遍历文件夹，压缩所有图片 (多进程 + 增量)。
     quality: 图片质量 (1-100)，70 也就是压缩 30%
     max_size: 图片最长边限制为 800像素
+    force: 忽略清单，全部重新检查
     """
     print("🚀 开始给图片瘦身...")
-    count = 0
-    saved_space = 0
+    manifest = {} if force else load_manifest(source_folder)
 
+    todo = []
+    skipped = 0
     for root, dirs, files in os.walk(source_folder):
         for file in files:
             if file.lower().endswith(('.jpg', '.jpeg', '.png')):
                 file_path = os.path.join(root, file)
+                rel = os.path.relpath(file_path, source_folder)
+                if _unchanged(file_path, manifest.get(rel), quality, max_size):
+                    skipped += 1
+                else:
+                    todo.append(file_path)
 
-                try:
-                    # 打开图片
-                    with Image.open(file_path) as img:
-                        # 获取原始大小
-                        original_size = os.path.getsize(file_path)
+    print(f"📋 共 {len(todo) + skipped} 张，清单里没变的 {skipped} 张直接跳过，需要检查 {len(todo)} 张")
 
-                        # 1. 修改尺寸 (如果太大)
-                        if max(img.size) > max_size:
-                            img.thumbnail((max_size, max_size))
-
-                        # 2. 转换并保存 (转为 RGB 防止 PNG 透明底报错)
-                        if img.mode in ("RGBA", "P"):
-                            img = img.convert("RGB")
-
-                        # 直接覆盖原文件 (保存为 JPG)
-                        # 注意：这会把 png 变成 jpg 后缀，但 Streamlit 能识别
-                        new_filename = os.path.splitext(file_path)[0] + ".jpg"
-                        img.save(new_filename, "JPEG", quality=quality)
-
-                        # 如果原文件是 png，删掉原来的 png，只留 jpg
-                        if file.lower().endswith('.png'):
-                            os.remove(file_path)
+    count = optimized = errors = 0
+    saved_space = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(compress_one, todo, [quality] * len(todo), [max_size] * len(todo), chunksize=8)
+        for status, path, old_size, new_size, err in results:
+            rel = os.path.relpath(path, source_folder)
+            if status == "error":
+                errors += 1
+                print(f"⚠️ 跳过坏图: {path} ({err})")
+                continue
 
-                        # 计算省了多少空间
-                        new_size = os.path.getsize(new_filename)
-                        saved_space += (original_size - new_size)
-                        count += 1
+            st = os.stat(path)
+            manifest[rel] = {"sha1": file_sha1(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                             "quality": quality, "max_size": max_size}
+            if status == "optimized":
+                optimized += 1
+                continue
 
-                        if count % 20 == 0:
-                            print(f"✅ 已处理 {count} 张图片...")
+            # 计算省了多少空间
+            count += 1
+            saved_space += old_size - new_size
+            pct = (1 - new_size / old_size) * 100 if old_size else 0
+            print(f"📉 {rel}: {old_size / 1024:.0f} KB -> {new_size / 1024:.0f} KB (-{pct:.0f}%)")
 
-                except Exception as e:
-                    print(f"⚠️ 跳过坏图: {file_path} ({e})")
+    # PNG 转成 JPG 后，旧路径的记录要清掉
+    for rel in [r for r in manifest if not os.path.exists(os.path.join(source_folder, r))]:
+        del manifest[rel]
+    save_manifest(source_folder, manifest)
 
     # 转换单位显示
     saved_mb = saved_space / (1024 * 1024)
-    print(f"\n🎉 搞定！共处理 {count} 张图片。")
+    print(f"\n🎉 搞定！压缩 {count} 张，已经够小的 {optimized} 张，跳过 {skipped} 张，坏图 {errors} 张。")
     print(f"📉 成功帮你把体积减小了：{saved_mb:.2f} MB！")
 
 
+# ==========================================
+# 🖼️ 多尺寸小图 (WebP + 渐进式 JPEG)
+# ==========================================
+
+def derivative_path(image_path, size, ext, source_folder="images", derived_folder=DERIVED_DIR):
+    """原图对应的小图路径：images/common/玫瑰/1.jpg -> static/derived/common/玫瑰/1_480.webp"""
+    rel = os.path.relpath(image_path, source_folder)
+    return os.path.join(derived_folder, f"{os.path.splitext(rel)[0]}_{size}.{ext}")
+
+
+def build_one_derivative(image_path, source_folder="images", derived_folder=DERIVED_DIR, sizes=DERIVED_SIZES):
+    """给一张原图生成所有尺寸的小图 (在子进程里跑)，已经比原图新的跳过。返回新写了几个文件"""
+    src_mtime = os.path.getmtime(image_path)
+    targets = [(size, ext, fmt, derivative_path(image_path, size, ext, source_folder, derived_folder))
+               for size in sizes for ext, fmt in DERIVED_FORMATS]
+    targets = [t for t in targets if not os.path.exists(t[3]) or os.path.getmtime(t[3]) < src_mtime]
+    if not targets: return 0
+
+    from PIL import Image
+    with Image.open(image_path) as img:
+        img.draft("RGB", (max(sizes), max(sizes)))  # 只解码一次，按最大尺寸
+        if img.mode not in ("RGB", "L"): img = img.convert("RGB")
+        img.load()
+        for size, ext, fmt, out_path in targets:
+            small = img.copy()
+            small.thumbnail((size, size))
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            tmp_path = out_path + ".tmp"
+            if fmt == "WEBP":
+                small.save(tmp_path, fmt, quality=75, method=4)
+            else:
+                small.save(tmp_path, fmt, quality=75, optimize=True, progressive=True)
+            os.replace(tmp_path, out_path)
+    return len(targets)
+
+
+def build_derivatives(source_folder="images", derived_folder=DERIVED_DIR, sizes=DERIVED_SIZES, workers=None):
+    """离线生成卡片用的多尺寸小图，只处理新增或改过的原图"""
+    print("🖼️ 开始生成卡片小图...")
+    images = [os.path.join(root, f) for root, dirs, files in os.walk(source_folder)
+              for f in files if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+
+    written = errors = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(build_one_derivative, p, source_folder, derived_folder, sizes) for p in images]
+        for path, future in zip(images, futures):
+            try:
+                written += future.result()
+            except Exception as e:
+                errors += 1
+                print(f"⚠️ 跳过坏图: {path} ({e})")
+
+    print(f"🎉 小图生成完毕：{len(images)} 张原图，新写入 {written} 个文件，坏图 {errors} 张。")
+
+
 if __name__ == '__main__':
     # 只要运行这个，你的 images 文件夹体积就会大幅缩小
-    compress_images("images")
\ No newline at end of file
+    compress_images("images")
+    # 顺便把卡片用的小图也生成好
+    build_derivatives("images")
@@ -0,0 +1,132 @@
+import sys
+import random
+from array import array
+from collections import deque
+import name_index
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+HISTORY_SIZE = 30  # 最多能“上一个”退回几张
+
+
+class Deck:
+    """
+    还没斩杀的卡片。会话里只存整数 ID (卡片表的下标)，卡片本身放在卡片表里：
+    系统题库的卡片表整个进程共用一份，上传的名单 / 图片包才是会话自己的。
+    顺序一开始就打乱，“下一个”顺着走；斩杀时用末尾那张补位再删掉末尾，O(1)。
+    """
+
+    __slots__ = ("table", "order", "pos")
+
+    def __init__(self, table, ids):
+        self.table = table
+        self.order = array("l", ids)
+        random.shuffle(self.order)
+        self.pos = 0
+
+    def __len__(self):
+        return len(self.order)
+
+    def current_id(self):
+        return self.order[self.pos]
+
+    def current(self):
+        return self.table[self.order[self.pos]]
+
+    def next(self):
+        self.pos = (self.pos + 1) % len(self.order)
+
+    def remove_current(self):
+        """斩杀当前这张：末尾那张挪过来补位，下一张就是它"""
+        self.order[self.pos] = self.order[-1]
+        self.order.pop()
+        if self.pos >= len(self.order): self.pos = 0
+
+    def seek(self, card_id):
+        """跳回某张 (“上一个”用)，已经斩杀掉的返回 False"""
+        try:
+            self.pos = self.order.index(card_id)
+        except ValueError:
+            return False
+        return True
+
+    def upcoming(self, ahead):
+        """接下来可能翻到的卡片：后面几张 + 斩杀时会补位的末尾那张 (预取用)"""
+        n = len(self.order)
+        ids = [self.order[(self.pos + i) % n] for i in range(1, min(ahead, n - 1) + 1)]
+        if n > 1 and self.order[-1] not in ids and self.pos != n - 1: ids.append(self.order[-1])
+        return [self.table[i] for i in ids]
+
+
+def parse_txt_content(content):
+    """
+    🌟 智能解析 TXT 内容
+    支持格式：
+    1. 仅名字: 玫瑰
+    2. 带详情: 玫瑰#蔷薇科#蔷薇属#Rosa rugosa
+    名字会归一化 (去多余空格、全角转半角)，归一化后重复的只留第一行
+    """
+    lines = [l.strip() for l in content.split('\n') if l.strip()]
+    plant_objects = []
+    seen = set()
+
+    for line in lines:
+        parts = [name_index.clean(p) for p in line.split('#')]  # 使用 # 作为分隔符
+        name = parts[0]
+        if not name or name_index.key(name) in seen: continue
+        seen.add(name_index.key(name))
+
+        # 基础对象
+        obj = {"name": name, "type": "api", "user_info": {}}
+
+        # 如果用户提供了额外信息，存入 user_info
+        # 顺序约定：名字 # 科 # 属 # 学名
+        if len(parts) > 1 and parts[1].strip(): obj["user_info"]["family_cn"] = parts[1].strip()
+        if len(parts) > 2 and parts[2].strip(): obj["user_info"]["genus_cn"] = parts[2].strip()
+        if len(parts) > 3 and parts[3].strip(): obj["user_info"]["scientific_name"] = parts[3].strip()
+
+        plant_objects.append(obj)
+
+    return plant_objects
+
+
+def new_history():
+    """“上一个”的记录：固定长度的环形缓冲，只存卡片 ID"""
+    return deque(maxlen=HISTORY_SIZE)
+
+
+def deep_size(obj, seen=None):
+    """粗略算一个对象连同它引用的东西一共占多少字节 (共享对象只算一次)"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen: return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif isinstance(obj, Deck):
+        size += deep_size(obj.order, seen)  # 卡片表是共享的，不算在会话头上
+    return size
+
+
+if __name__ == '__main__':
+    # 估一下每个会话占多少内存：旧做法 (完整卡片列表 + 无限历史) vs 现在 (ID + 环形历史)
+    n, steps = 5000, 2000
+    table = [{"name": f"植物{i}", "type": "local", "images": [f"images/common/植物{i}/{j}.jpg" for j in range(3)],
+              "folder_path": f"images/common/植物{i}", "info": {"scientific_name": "Genus species",
+                                                                 "family_cn": "某科", "genus_cn": "某属"}}
+             for i in range(n)]
+    data = {"name_cn": "植物0", "local": True, "image_path": "images/common/植物0/0.jpg",
+            "scientific_name": "Genus species", "family_cn": "某科", "genus_cn": "某属"}
+
+    old = {"quiz_list": [dict(c, image_path=c["images"][0]) for c in table],
+           "history": [{"index": i, "data": dict(data), "show_answer": True} for i in range(steps)]}
+    deck, history = Deck(table, range(n)), new_history()
+    for _ in range(steps):
+        history.append(deck.current_id())
+        deck.next()
+    new = {"deck": deck, "history": history}
+    print(f"📏 {n} 张卡片、翻 {steps} 次：旧 {deep_size(old) / 1024:.0f} KB -> 现在 {deep_size(new) / 1024:.0f} KB")
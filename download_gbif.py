@@ -1,23 +1,131 @@
+import io
 import os
-import requests
-import plant_expert  # 引用之前的专家模块
+import sys
+import json
 import time
+import queue
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+import plant_expert  # 引用之前的专家模块
+import metrics
+import transport
+import catalog
+import name_index
+
+# 批量模式的断点续传日志放这里 (每个输出目录一份)
+JOURNAL_DIR = "cache"
+
+# 单张图片最大字节数，超过就放弃 (Bing 的原图经常好几 MB)
+MAX_IMAGE_BYTES = 8 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# 下载时顺手缩图的最长边 (None = 不缩)，命令行 --max-side 800 可以改
+DOWNLOAD_MAX_SIDE = None
 
+# 每种植物存几张图 (1.jpg..K.jpg)，复习时随机挑；命令行 --pool K 调整
+POOL_SIZE = 1
+MIN_IMAGE_SIDE = 300  # 短边比这还小的图不要
+IMAGE_MAGIC = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"GIF87a", b"GIF89a", b"BM")
 
-def download_image(url, save_path):
-    """下载单张图片"""
+
+def sniff_image(head):
+    """看文件头判断是不是图片 (Bing 的链接经常返回 HTML 错误页)"""
+    return any(head.startswith(magic) for magic in IMAGE_MAGIC) or (head[:4] == b"RIFF" and head[8:12] == b"WEBP")
+
+
+def _stream_image(url, out, max_bytes, max_side):
+    """把图片分块下到 out (文件对象)，不合格返回 False；max_side 不为空时顺手缩图"""
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    received = 0
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=5)
-        if response.status_code == 200:
-            with open(save_path, 'wb') as f:
-                f.write(response.content)
-            return True
-    except:
+        with transport.get(url, headers=headers, timeout=5, stream=True) as response:
+            if response.status_code != 200: return False
+            length = response.headers.get("Content-Length")
+            if length and length.isdigit() and int(length) > max_bytes: return False
+
+            # 要缩图就先攒在内存里 (受 max_bytes 限制)，不缩图就直接写出去
+            buffer = io.BytesIO() if max_side else out
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if received == 0 and not sniff_image(chunk[:16]): return False
+                received += len(chunk)
+                if received > max_bytes: return False
+                buffer.write(chunk)
+            if received == 0: return False
+    finally:
+        metrics.add_bytes(received)
+
+    if max_side:
+        buffer.seek(0)
+        with Image.open(buffer) as img:
+            img.draft("RGB", (max_side, max_side))  # JPEG 直接按缩小的尺寸解码，省内存
+            img.thumbnail((max_side, max_side))
+            if img.mode not in ("RGB", "L"): img = img.convert("RGB")
+            img.save(out, "JPEG", quality=85, optimize=True)
+    return True
+
+
+@metrics.instrument("image_download", ok=bool)
+def download_image(url, save_path, max_bytes=None, max_side=None, min_side=None):
+    """
+    流式下载单张图片：分块读，超过 max_bytes 直接放弃；文件头不是图片也直接放弃。
+    先写到同目录的临时文件，PIL 校验通过后再原子改名成 save_path。
+    max_side: 顺手把最长边缩到这个像素，原图既不落盘也不会整张解码在内存里。
+    min_side: 短边小于这个像素的图不要 (只读文件头判断)。
+    """
+    max_bytes = max_bytes or MAX_IMAGE_BYTES
+    max_side = max_side or DOWNLOAD_MAX_SIDE
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(save_path) or ".", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            if not _stream_image(url, out, max_bytes, max_side): return False
+        with Image.open(tmp_path) as img:
+            if min_side and min(img.size) < min_side: return False
+            img.verify()
+        os.replace(tmp_path, save_path)
+        return True
+    except Exception:
         return False
-    return False
+    finally:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+
+
+@metrics.instrument("image_download")
+def download_pool(urls, plant_dir, size=None):
+    """
+    按顺序试候选图，凑够 size 张存成 1.jpg..K.jpg (已有的编号跳过)，返回新存下的路径。
+    某张坏了不用重新查，换下一个候选就行。
+    """
+    size = size or POOL_SIZE
+    saved = []
+    index = 1
+    for url in dict.fromkeys(u for u in urls if u):
+        if len(saved) >= size: break
+        while os.path.exists(os.path.join(plant_dir, f"{index}.jpg")): index += 1
+        path = os.path.join(plant_dir, f"{index}.jpg")
+        if download_image(url, path, min_side=MIN_IMAGE_SIDE): saved.append(path)
+    return saved
+
+
+def _candidates(info):
+    return [info.get('image_url')] + info.get('image_candidates', [])
+
+
+def write_info(plant_dir, info):
+    """写 info.txt (植物的身份证)"""
+    with open(os.path.join(plant_dir, "info.txt"), "w", encoding="utf-8") as f:
+        f.write(f"中文名: {info['name_cn']}\n")
+        f.write(f"学名: {info['scientific_name']}\n")
+        f.write(f"科: {info['family']}\n")
+        f.write(f"属: {info['genus']}\n")
+
+
+def has_image(plant_dir):
+    if not os.path.isdir(plant_dir): return False
+    return any(f.lower().endswith(('.jpg', '.png', '.jpeg')) for f in os.listdir(plant_dir))
 
 
 def process_list(txt_filename, output_subfolder):
@@ -32,7 +140,7 @@ def process_list(txt_filename, output_subfolder):
     os.makedirs(base_output, exist_ok=True)
 
     with open(txt_filename, 'r', encoding='utf-8') as f:
-        plant_names = [line.strip() for line in f.readlines() if line.strip()]
+        plant_names = name_index.clean_names(f)
 
     total = len(plant_names)
     print(f"🚀 开始处理 {txt_filename}，共 {total} 个...")
@@ -63,19 +171,14 @@ def process_list(txt_filename, output_subfolder):
         # 3. 只有搜到了且有图，才创建文件夹
         os.makedirs(plant_dir, exist_ok=True)
 
-        # 4. 下载
-        save_path = os.path.join(plant_dir, "1.jpg")
-        success = download_image(info['image_url'], save_path)
+        # 4. 下载 (POOL_SIZE > 1 时存一个小图片池)
+        success = download_pool(_candidates(info), plant_dir)
 
         if success:
             print(f"✅ 成功 (学名: {info['scientific_name']})")
 
             # 顺便存个身份证，以后复习用
-            with open(os.path.join(plant_dir, "info.txt"), "w", encoding="utf-8") as f:
-                f.write(f"中文名: {info['name_cn']}\n")
-                f.write(f"学名: {info['scientific_name']}\n")
-                f.write(f"科: {info['family']}\n")
-                f.write(f"属: {info['genus']}\n")
+            write_info(plant_dir, info)
         else:
             print("❌ 下载失败，跳过")
             # 如果下载失败，把空文件夹删了，保持整洁
@@ -84,13 +187,173 @@ def process_list(txt_filename, output_subfolder):
             except:
                 pass
 
-        # 稍微歇一下
-        time.sleep(0.2)
+
+# ==========================================
+# 🚚 批量流水线模式 (并发 + 断点续传)
+# ==========================================
+
+class Journal:
+    """断点续传日志：每处理完一个名字追加一行 JSON 并落盘，进程被杀也不丢"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.last = {}  # 名字 -> 最后一条记录
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # 被杀时写了一半的行
+                    self.last[rec["name"]] = rec
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def record(self, name, status, **extra):
+        rec = {"name": name, "status": status, "ts": round(time.time(), 1), **extra}
+        with self.lock:
+            self.file.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.last[name] = rec
+
+    def close(self):
+        self.file.close()
+
+
+def _needs_work(name, plant_dir, journal, retry_misses):
+    """只处理缺图、缺 info.txt、上次失败或还没跑到的名字"""
+    if has_image(plant_dir):
+        return not os.path.exists(os.path.join(plant_dir, "info.txt"))
+    rec = journal.last.get(name)
+    if rec and rec["status"] in ("miss", "noimage") and not retry_misses:
+        return False
+    return True
+
+
+def process_list_bulk(txt_filename, output_subfolder, lookup_workers=8, download_workers=8, retry_misses=False):
+    """
+    批量模式：查询和下载分成两级线程池，中间用队列连起来。
+    进度写在 cache/download_<目录>.jsonl，中途被杀重跑会从断点接着来；
+    目录里已经有图的直接跳过。结束时打印吞吐量统计。
+    """
+    if not os.path.exists(txt_filename):
+        print(f"❌ 找不到文件: {txt_filename}")
+        return
+
+    base_output = os.path.join("images", output_subfolder)
+    os.makedirs(base_output, exist_ok=True)
+
+    with open(txt_filename, 'r', encoding='utf-8') as f:
+        plant_names = name_index.clean_names(f)
+
+    journal = Journal(os.path.join(JOURNAL_DIR, f"download_{output_subfolder}.jsonl"))
+    todo = [n for n in plant_names if _needs_work(n, os.path.join(base_output, n), journal, retry_misses)]
+    total = len(todo)
+    print(f"🚀 批量处理 {txt_filename}：共 {len(plant_names)} 个，需要处理 {total} 个...")
+
+    stats = Counter()
+    failures = Counter()  # 按数据源统计失败次数
+    stats_lock = threading.Lock()
+    downloads = queue.Queue(maxsize=download_workers * 4)
+    started = time.monotonic()
+
+    def report(name, status, msg, **extra):
+        journal.record(name, status, **extra)
+        with stats_lock:
+            stats[status] += 1
+            stats["bytes"] += extra.get("bytes", 0)
+            if status in ("miss", "noimage", "failed"):
+                failures[extra.get("source") or "lookup"] += 1
+            done = sum(stats[k] for k in ("done", "info", "miss", "noimage", "failed"))
+        print(f"[{done}/{total}] {name} : {msg}", flush=True)
+
+    def lookup(name):
+        try:
+            info = plant_expert.fetch_plant_info(name, verbose=False)
+        except Exception as e:
+            report(name, "failed", f"❌ 查询出错 ({e})")
+            return
+        plant_dir = os.path.join(base_output, name)
+        if not info:
+            report(name, "miss", "💨 搜不到，跳过")
+        elif has_image(plant_dir):
+            # 图已经有了，只补 info.txt
+            try:
+                write_info(plant_dir, info)
+            except OSError as e:
+                report(name, "failed", f"❌ 写 info.txt 出错 ({e})")
+                return
+            report(name, "info", "📝 已补全 info.txt")
+        elif not info.get('image_url'):
+            report(name, "noimage", "💨 无图片，跳过")
+        else:
+            downloads.put((name, info))
+
+    def download_one(name, info):
+        plant_dir = os.path.join(base_output, name)
+        os.makedirs(plant_dir, exist_ok=True)
+        saved = download_pool(_candidates(info), plant_dir)
+        if saved:
+            write_info(plant_dir, info)
+            report(name, "done", f"✅ 成功 {len(saved)} 张 (学名: {info['scientific_name']})",
+                   source=info.get('image_source'), url=info['image_url'],
+                   bytes=sum(os.path.getsize(p) for p in saved))
+        else:
+            try:
+                os.rmdir(plant_dir)
+            except OSError:
+                pass
+            report(name, "failed", "❌ 下载失败，跳过", source=info.get('image_source'), url=info['image_url'])
+
+    def download_worker():
+        # 单个出错 (比如磁盘写不进去) 只记失败，线程不能死：下载线程全死了，查询线程会卡在 downloads.put 上
+        while True:
+            item = downloads.get()
+            try:
+                if item is None: return
+                name, info = item
+                try:
+                    download_one(name, info)
+                except Exception as e:
+                    report(name, "failed", f"❌ 保存出错 ({e})", source=info.get('image_source'), url=info.get('image_url'))
+            finally:
+                downloads.task_done()
+
+    downloaders = [threading.Thread(target=download_worker, daemon=True) for _ in range(download_workers)]
+    for t in downloaders: t.start()
+    try:
+        with ThreadPoolExecutor(max_workers=lookup_workers) as pool:
+            list(pool.map(lookup, todo))
+    finally:
+        for _ in downloaders: downloads.put(None)
+        for t in downloaders: t.join()
+        journal.close()
+
+    elapsed = max(time.monotonic() - started, 1e-6)
+    print(f"\n📊 {txt_filename} 统计：用时 {elapsed:.1f}s，"
+          f"{total / elapsed:.2f} 个/秒，{stats['bytes'] / elapsed / 1024:.1f} KB/秒")
+    print(f"   成功 {stats['done']} | 补 info {stats['info']} | 搜不到 {stats['miss']} | "
+          f"无图 {stats['noimage']} | 失败 {stats['failed']}")
+    if failures:
+        print("   失败来源：" + "，".join(f"{src} {n}" for src, n in failures.most_common()))
 
 
 if __name__ == '__main__':
-    # 记得先清空 images 文件夹再运行，效果最好
-    process_list('plants.txt', 'common')
-    process_list('重点.txt', 'important')
+    if "--max-side" in sys.argv:
+        DOWNLOAD_MAX_SIDE = int(sys.argv[sys.argv.index("--max-side") + 1])
+    if "--pool" in sys.argv:
+        POOL_SIZE = int(sys.argv[sys.argv.index("--pool") + 1])
+
+    if "--bulk" in sys.argv:
+        # 并发批量模式，可以随时 Ctrl+C，重跑会接着来
+        process_list_bulk('plants.txt', 'common')
+        process_list_bulk('重点.txt', 'important')
+    else:
+        # 记得先清空 images 文件夹再运行，效果最好
+        process_list('plants.txt', 'common')
+        process_list('重点.txt', 'important')
+    catalog.build()  # 新下载的植物写进题库索引
 
     print("\n🎉 处理完成！没下载下来的就是 GBIF 里没有的。")
\ No newline at end of file
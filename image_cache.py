@@ -0,0 +1,122 @@
+import os
+import time
+import hashlib
+import threading
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+CACHE_DIR = os.environ.get("PLANT_IMAGE_CACHE", os.path.join("cache", "images"))
+MAX_CACHE_BYTES = 500 * 1024 * 1024  # 磁盘上最多占多少，超过按最近最少使用淘汰到 90%
+DISPLAY_SIDE = 800  # 默认缩到的最长边
+FAILED_TTL = 3600  # 下载失败的地址多久内不再重试 (秒)
+
+_lock = threading.Lock()
+_total = None  # 缓存目录当前总字节数 (第一次用到时扫一遍)
+_failed = {}  # url -> 到期时间
+_inflight = {}  # 正在下载的 path -> Event，同一张图只下一次
+
+
+def cache_path(url, max_side=DISPLAY_SIDE):
+    """按 URL 的哈希定位缓存文件 (同一个地址缩成不同尺寸分开存)"""
+    digest = hashlib.sha1(f"{max_side}|{url}".encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, digest[:2], digest + ".jpg")
+
+
+def _scan():
+    total = 0
+    for folder, _, files in os.walk(CACHE_DIR):
+        for file in files:
+            if file.endswith(".jpg"): total += os.path.getsize(os.path.join(folder, file))
+    return total
+
+
+def _account(nbytes):
+    global _total
+    with _lock:
+        if _total is None:
+            _total = _scan()  # 刚写进去的这张已经扫到了
+        else:
+            _total += nbytes
+        over = _total > MAX_CACHE_BYTES
+    if over: evict()
+
+
+def evict(max_bytes=None):
+    """按修改时间 (命中时会刷新) 从旧到新删，删到上限的 90%"""
+    global _total
+    max_bytes = max_bytes or MAX_CACHE_BYTES
+    files = []
+    for folder, _, names in os.walk(CACHE_DIR):
+        for name in names:
+            if not name.endswith(".jpg"): continue
+            path = os.path.join(folder, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes * 0.9: break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    with _lock:
+        _total = total
+
+
+def fetch(url, max_side=DISPLAY_SIDE):
+    """
+    取一张远程图的本地缓存文件路径：有缓存直接用 (顺便刷新使用时间)，
+    没有就下载、校验、缩图后存进来；下载失败返回 None，一段时间内不再重试这个地址。
+    """
+    if not url: return None
+    path = cache_path(url, max_side)
+    if os.path.exists(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    with _lock:
+        if _failed.get(url, 0) > time.time(): return None
+        event = _inflight.get(path)
+        owner = event is None
+        if owner: event = _inflight[path] = threading.Event()
+    if not owner:
+        event.wait()  # 别的线程正在下同一张
+        return path if os.path.exists(path) else None
+
+    try:
+        import download_gbif  # 下载要用 PIL + requests，第一次真要下图时才加载
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if download_gbif.download_image(url, path, max_side=max_side):
+            _account(os.path.getsize(path))
+            return path
+        with _lock:
+            _failed[url] = time.time() + FAILED_TTL
+        return None
+    finally:
+        with _lock:
+            _inflight.pop(path, None)
+        event.set()
+
+
+def fetch_first(urls, max_side=DISPLAY_SIDE):
+    """按顺序试候选地址，返回第一张能用的 (url, 本地路径)，全都不行返回 (None, None)"""
+    for url in dict.fromkeys(u for u in urls if u):
+        path = fetch(url, max_side)
+        if path: return url, path
+    return None, None
+
+
+def stats():
+    with _lock:
+        total = _total if _total is not None else _scan()
+    return {"bytes": total, "max_bytes": MAX_CACHE_BYTES, "failed_urls": len(_failed)}
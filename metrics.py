@@ -0,0 +1,205 @@
+import os
+import time
+import bisect
+import functools
+import threading
+from collections import deque, defaultdict
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+# PLANT_METRICS=0 关掉统计 (被装饰的函数只多一次全局变量判断)
+ENABLED = os.environ.get("PLANT_METRICS", "1") != "0"
+
+# 延迟直方图的桶边界 (秒)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+RECENT_SPANS = 200  # 最近多少次调用留明细 (管理面板里看)
+
+OUTCOMES = ("hit", "miss", "timeout", "error", "cached")
+
+_lock = threading.Lock()
+_local = threading.local()
+_counts = defaultdict(int)  # (source, outcome) -> 次数
+_hist = {}  # source -> [每个桶的次数..., 总次数, 总秒数]
+_bytes = defaultdict(int)  # source -> 字节数
+_recent = deque(maxlen=RECENT_SPANS)
+
+
+# ==========================================
+# 📝 记录
+# ==========================================
+
+def record(source, outcome, seconds=None, nbytes=0):
+    """记一次调用；seconds 为空 (比如缓存命中) 就只计数，不进延迟直方图"""
+    if not ENABLED: return
+    with _lock:
+        _counts[(source, outcome)] += 1
+        if nbytes: _bytes[source] += nbytes
+        if seconds is not None:
+            hist = _hist.get(source)
+            if hist is None: hist = _hist[source] = [0] * (len(BUCKETS) + 2) + [0.0]
+            hist[bisect.bisect_left(BUCKETS, seconds)] += 1
+            hist[-2] += 1
+            hist[-1] += seconds
+        _recent.append({"time": time.time(), "source": source, "outcome": outcome,
+                        "ms": None if seconds is None else round(seconds * 1000, 1), "bytes": nbytes})
+
+
+def add_bytes(nbytes):
+    """transport / 下载里调用：把收到的字节数记到当前线程正在跑的那次调用头上"""
+    if getattr(_local, "bytes", None) is not None: _local.bytes += nbytes
+
+
+def run_until(deadline, func, *args, **kwargs):
+    """
+    线程池里跑一次查询，调用方只等到 deadline (time.monotonic() 的时刻)。
+    过了截止时间才回来的，调用方已经不要了：instrument 记成 timeout，不再记 hit / miss (每次调用只记一次)
+    """
+    outer = getattr(_local, "deadline", None)
+    _local.deadline = deadline
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _local.deadline = outer
+
+
+def remaining():
+    """当前线程这次查询离截止时间还剩几秒，没有截止时间返回 None"""
+    deadline = getattr(_local, "deadline", None)
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _outcome_of(exc):
+    return "timeout" if isinstance(exc, TimeoutError) or "Timeout" in type(exc).__name__ else "error"
+
+
+def instrument(source, miss=None, ok=None):
+    """
+    装饰器：给一次查询计时，结果记成 hit / miss，抛异常记成 timeout / error (异常照样往上抛)。
+    miss: 函数“查不到”时的返回值；ok: 也可以直接给个判断函数 ok(result) -> bool
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED: return func(*args, **kwargs)
+            outer = getattr(_local, "bytes", None)
+            _local.bytes = 0
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = func(*args, **kwargs)
+                found = ok(result) if ok else result != miss and result is not None
+                left = remaining()
+                outcome = "timeout" if left is not None and left < 0 else "hit" if found else "miss"
+                return result
+            except Exception as e:
+                outcome = _outcome_of(e)
+                raise
+            finally:
+                nbytes = _local.bytes
+                _local.bytes = None if outer is None else outer + nbytes
+                record(source, outcome, time.perf_counter() - start, nbytes)
+
+        return wrapper
+
+    return decorator
+
+
+def reset():
+    with _lock:
+        _counts.clear()
+        _hist.clear()
+        _bytes.clear()
+        _recent.clear()
+
+
+# ==========================================
+# 📊 汇总 / 导出
+# ==========================================
+
+def _quantile(hist, q):
+    """从直方图估分位数 (桶内线性插值，最后一个桶按上一条边界算)"""
+    total = hist[-2]
+    if not total: return None
+    target, seen = q * total, 0
+    for i, count in enumerate(hist[:len(BUCKETS) + 1]):
+        if seen + count >= target and count:
+            lower = BUCKETS[i - 1] if i > 0 else 0.0
+            upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+            return lower + (upper - lower) * (target - seen) / count
+        seen += count
+    return BUCKETS[-1]
+
+
+def summary():
+    """每个数据源一行：各结果次数、命中率、p50/p90 延迟 (毫秒)、字节数"""
+    with _lock:
+        counts, hists, nbytes = dict(_counts), {k: list(v) for k, v in _hist.items()}, dict(_bytes)
+    rows = []
+    for source in sorted({s for s, _ in counts} | set(hists)):
+        row = {"source": source}
+        row.update({outcome: counts.get((source, outcome), 0) for outcome in OUTCOMES})
+        total = sum(row[o] for o in OUTCOMES)
+        row["hit_rate"] = round((row["hit"] + row["cached"]) / total, 3) if total else None
+        hist = hists.get(source)
+        for name, q in (("p50_ms", 0.5), ("p90_ms", 0.9)):
+            value = _quantile(hist, q) if hist else None
+            row[name] = None if value is None else round(value * 1000, 1)
+        row["avg_ms"] = round(hist[-1] / hist[-2] * 1000, 1) if hist and hist[-2] else None
+        row["bytes"] = nbytes.get(source, 0)
+        rows.append(row)
+    return rows
+
+
+def recent(limit=50):
+    with _lock:
+        return list(_recent)[-limit:][::-1]
+
+
+def prometheus():
+    """Prometheus 文本格式"""
+    with _lock:
+        counts, hists, nbytes = dict(_counts), {k: list(v) for k, v in _hist.items()}, dict(_bytes)
+    lines = ["# HELP plant_resolver_calls_total Resolver calls by source and outcome.",
+             "# TYPE plant_resolver_calls_total counter"]
+    for (source, outcome), n in sorted(counts.items()):
+        lines.append(f'plant_resolver_calls_total{{source="{source}",outcome="{outcome}"}} {n}')
+    lines += ["# HELP plant_resolver_latency_seconds Resolver call latency.",
+              "# TYPE plant_resolver_latency_seconds histogram"]
+    for source, hist in sorted(hists.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS, hist):
+            cumulative += count
+            lines.append(f'plant_resolver_latency_seconds_bucket{{source="{source}",le="{bound}"}} {cumulative}')
+        lines.append(f'plant_resolver_latency_seconds_bucket{{source="{source}",le="+Inf"}} {hist[-2]}')
+        lines.append(f'plant_resolver_latency_seconds_sum{{source="{source}"}} {hist[-1]:.6f}')
+        lines.append(f'plant_resolver_latency_seconds_count{{source="{source}"}} {hist[-2]}')
+    lines += ["# HELP plant_resolver_bytes_total Bytes received per source.",
+              "# TYPE plant_resolver_bytes_total counter"]
+    for source, n in sorted(nbytes.items()):
+        lines.append(f'plant_resolver_bytes_total{{source="{source}"}} {n}')
+    return "\n".join(lines) + "\n"
+
+
+def serve(port=9108, host="127.0.0.1"):
+    """在后台线程开一个 /metrics 接口给 Prometheus 抓 (和 App 同一个进程才看得到数据)"""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            body = prometheus().encode("utf-8")
+            self.send_response(200 if self.path.startswith("/metrics") else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,219 @@
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import defaultdict
+import catalog
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+GRAM = 2  # 按几个字切片 (中文两个字一片正好)
+MIN_SCORE = 0.5  # 模糊候选的最低相似度
+# 直接采用只认精确匹配和栽培品种退回到种；模糊的不管多像都只当候选给人挑：
+# 'Ficus macrocarpa' 和 Ficus microcarpa、'Rosa sinensis' 和 Rosa chinensis 都是不同的种
+ACCEPT_MATCHES = ("exact", "species")
+
+# 各种引号统一成半角单引号 (栽培品种名 'White Rajah' 的写法五花八门)
+_QUOTES = str.maketrans({c: "'" for c in "‘’‚‛“”„‟\"`´「」『』"})
+_RANKS = {"var.", "subsp.", "ssp.", "f.", "cv.", "×", "x"}
+_PARENS = re.compile(r"\([^)]*\)")
+
+_lock = threading.Lock()
+_index = None
+
+
+# ==========================================
+# 🧹 名字归一化
+# ==========================================
+
+def clean(name):
+    """给人看的名字：全角转半角、统一引号、合并空格、去首尾空格 ('华南苏铁 ' -> '华南苏铁')"""
+    text = unicodedata.normalize("NFKC", str(name or "")).translate(_QUOTES)
+    return " ".join(text.split())
+
+
+def canonical_latin(name):
+    """
+    学名去掉命名人，保留 属 种加词 (变种 / 亚种 / 栽培品种)：
+    'Ilex cornuta Lindl. & Paxton' -> 'Ilex cornuta'
+    "Aglaonema commutatum 'White Rajah'" -> "Aglaonema commutatum 'White Rajah'"
+    """
+    text = clean(name)
+    cultivar = re.findall(r"'[^']+'", text)
+    words = _PARENS.sub(" ", re.sub(r"'[^']+'", " ", text)).split()
+    if not words: return " ".join(cultivar)
+    keep = [words[0].capitalize()]
+    rest = words[1:]
+    i = 0
+    while i < len(rest):
+        word = rest[i]
+        if word.lower() in _RANKS and i + 1 < len(rest) and rest[i + 1][:1].islower():
+            keep += ["×" if word.lower() in ("×", "x") else word.lower(), rest[i + 1]]
+            i += 2
+            continue
+        if len(keep) == 1 and word[:1].islower() and word.isalpha(): keep.append(word)
+        i += 1
+    return " ".join(keep + cultivar)
+
+
+def key(name):
+    """查找用的键：中文名去掉所有空白和括号注释，学名先去命名人；都忽略大小写"""
+    text = clean(name)
+    if catalog.contains_chinese(text): return _PARENS.sub("", text).replace(" ", "").casefold()
+    return canonical_latin(text).casefold()
+
+
+def species_key(name):
+    """栽培品种退回到种：找不到 'White Rajah' 就用 Aglaonema commutatum"""
+    return re.sub(r"\s*'[^']+'", "", key(name)).strip()
+
+
+def clean_names(lines):
+    """名单逐行清洗，空行去掉，归一化后相同的名字只留第一个"""
+    seen, names = set(), []
+    for line in lines:
+        name = clean(line)
+        if name and key(name) not in seen:
+            seen.add(key(name))
+            names.append(name)
+    return names
+
+
+def _grams(text):
+    text = f" {text} "
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+# ==========================================
+# 🗂️ 索引
+# ==========================================
+
+class NameIndex:
+    """
+    本地知道的所有名字 (中文名和学名) -> 学名。精确匹配查字典，模糊匹配用 n-gram 倒排表：
+    只和至少有一片相同的名字算相似度 (Dice 系数)，几千上万个名字也是微秒级。
+    """
+
+    def __init__(self):
+        self.entries = []  # (名字, 学名, 来源)
+        self.exact = {}  # key -> 条目下标 (先加的优先)
+        self.postings = defaultdict(list)  # 片 -> 条目下标
+        self.sizes = []  # 每个条目切成几片
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, name, latin, source):
+        name = clean(name)
+        if not name or not latin: return
+        if not catalog.contains_chinese(name): name = canonical_latin(name)
+        k = key(name)
+        if not k or k in self.exact: return
+        self.exact[k] = len(self.entries)
+        grams = _grams(k)
+        for gram in grams: self.postings[gram].append(len(self.entries))
+        self.sizes.append(len(grams))
+        self.entries.append((name, canonical_latin(latin), source))
+
+    def _hit(self, i, score, match):
+        name, latin, source = self.entries[i]
+        return {"name": name, "latin": latin, "source": source, "score": score, "match": match}
+
+    def search(self, query, limit=5):
+        """
+        按相似度排好的候选 [{"name", "latin", "source", "score", "match"}]，
+        match: exact (归一化后相同，score=1) / species (栽培品种退回到种，0.95) / fuzzy
+        """
+        k = key(query)
+        if not k: return []
+        if k in self.exact: return [self._hit(self.exact[k], 1.0, "exact")]
+        results = []
+        base = species_key(query)
+        if base != k and base in self.exact: results.append(self._hit(self.exact[base], 0.95, "species"))
+
+        grams = _grams(k)
+        shared = defaultdict(int)
+        for gram in grams:
+            for i in self.postings.get(gram, ()): shared[i] += 1
+        scored = []
+        for i, n in shared.items():
+            score = 2 * n / (len(grams) + self.sizes[i])
+            if score >= MIN_SCORE: scored.append((score, i))
+        seen = {r["name"] for r in results}
+        for score, i in sorted(scored, key=lambda s: (-s[0], s[1])):
+            if len(results) >= limit: break
+            if self.entries[i][0] not in seen: results.append(self._hit(i, round(score, 3), "fuzzy"))
+        return results[:limit]
+
+    def best(self, query):
+        """能直接采用的那一个：精确 / 栽培品种退回到种，没有返回 None (模糊候选用 search 看)"""
+        hits = self.search(query, limit=1)
+        return hits[0] if hits and hits[0]["match"] in ACCEPT_MATCHES else None
+
+
+def build(entries=None):
+    """
+    从人工字典、题库索引 (文件夹名 + info.txt)、离线分类库收集名字 (越靠前越优先)。
+    entries: 题库条目，不给就读现成的 images/catalog.jsonl —— 查名字绝不触发重扫题库
+    """
+    import plant_expert
+    import taxonomy
+
+    index = NameIndex()
+    for name, entry in plant_expert.CUSTOM_DICTIONARY.items():
+        latin = entry["latin"] if isinstance(entry, dict) else entry
+        index.add(name, latin, "dictionary")
+        index.add(latin, latin, "dictionary")
+    for e in catalog.read() if entries is None else entries:
+        latin = e["info"].get("scientific_name")
+        if not latin: continue
+        index.add(e["name"], latin, "catalog")
+        index.add(latin, latin, "catalog")
+    try:
+        conn = taxonomy._connect()
+        for name, latin in conn.execute("SELECT name, latin FROM names"): index.add(name, latin, "taxonomy")
+        for (latin,) in conn.execute("SELECT latin FROM taxa WHERE rank = 'species'"):
+            index.add(latin, latin, "taxonomy")
+    except sqlite3.Error:
+        pass
+    return index
+
+
+def get_index():
+    """整个进程共用一份，第一次用到时建"""
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None: _index = build()
+    return _index
+
+
+def reset():
+    """题库或分类库更新后调用，下次用到时重建"""
+    global _index
+    _index = None
+
+
+def search(query, limit=5):
+    return get_index().search(query, limit)
+
+
+def best(query):
+    return get_index().best(query)
+
+
+if __name__ == '__main__':
+    # 用法：python name_index.py 华南苏铁 "Ilex cornuta Lindl. & Paxton" ...
+    import sys
+    import time
+
+    start = time.perf_counter()
+    idx = get_index()
+    print(f"🗂️ 索引 {len(idx)} 个名字，建索引 {(time.perf_counter() - start) * 1000:.0f} ms")
+    for q in sys.argv[1:]:
+        start = time.perf_counter()
+        hits = idx.search(q)
+        print(f"{q!r} ({(time.perf_counter() - start) * 1e6:.0f} µs):")
+        for h in hits: print(f"    {h['score']:.2f}  {h['name']} -> {h['latin']} ({h['source']})")
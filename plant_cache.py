@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import sqlite3
+import functools
+import threading
+import unicodedata
+import metrics
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+CACHE_PATH = os.environ.get("PLANT_CACHE_PATH", os.path.join("cache", "plant_cache.sqlite3"))
+CACHE_ENABLED = os.environ.get("PLANT_CACHE", "1") != "0"
+
+# 缓存条数上限，超过后先淘汰最早过期的
+MAX_ENTRIES = 50000
+
+DAY = 24 * 3600
+
+# 各数据源的缓存时间 (秒)：(命中 TTL, 未命中 TTL)
+# 未命中也要缓存，免得查不到的名字每次都去问一遍
+SOURCE_TTLS = {
+    "inaturalist": (60 * DAY, 7 * DAY),
+    "gbif": (60 * DAY, 7 * DAY),
+    "gbif_species": (90 * DAY, 14 * DAY),
+    "wikimedia": (30 * DAY, 7 * DAY),
+    "bing": (14 * DAY, 3 * DAY),
+    "wikidata": (90 * DAY, 14 * DAY),
+    "wikidata_label": (90 * DAY, 14 * DAY),
+}
+DEFAULT_TTL = (30 * DAY, 7 * DAY)
+
+_local = threading.local()
+_memo = {}  # 进程内一级缓存：(source, key) -> (expires, value)
+_lock = threading.Lock()
+_puts_since_evict = 0
+
+
+# ==========================================
+# 🛠️ 底层读写
+# ==========================================
+
+def normalize_key(name):
+    """统一缓存键：全角转半角、去首尾空格、合并空格、忽略大小写"""
+    text = unicodedata.normalize("NFKC", str(name))
+    return " ".join(text.split()).casefold()
+
+
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        folder = os.path.dirname(CACHE_PATH)
+        if folder: os.makedirs(folder, exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS lookup (
+                source TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT,
+                hit INTEGER NOT NULL,
+                expires REAL NOT NULL,
+                PRIMARY KEY (source, key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_lookup_expires ON lookup (expires)")
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+
+def get(source, key):
+    """查缓存，返回 (是否命中缓存, 值)；值为 None 表示缓存的是“查无此物”"""
+    now = time.time()
+    memo = _memo.get((source, key))
+    if memo and memo[0] > now:
+        return True, memo[1]
+
+    row = _connect().execute(
+        "SELECT value, expires FROM lookup WHERE source = ? AND key = ?", (source, key)).fetchone()
+    if not row or row[1] <= now:
+        return False, None
+    value = json.loads(row[0]) if row[0] is not None else None
+    _remember(source, key, row[1], value)
+    return True, value
+
+
+def put(source, key, value):
+    """写缓存；value 为 None 时按未命中的 TTL 存"""
+    global _puts_since_evict
+    hit_ttl, miss_ttl = SOURCE_TTLS.get(source, DEFAULT_TTL)
+    expires = time.time() + (hit_ttl if value is not None else miss_ttl)
+    raw = json.dumps(value, ensure_ascii=False) if value is not None else None
+
+    conn = _connect()
+    conn.execute("INSERT OR REPLACE INTO lookup (source, key, value, hit, expires) VALUES (?, ?, ?, ?, ?)",
+                 (source, key, raw, int(value is not None), expires))
+    conn.commit()
+    _remember(source, key, expires, value)
+
+    with _lock:
+        _puts_since_evict += 1
+        need_evict = _puts_since_evict >= 200
+        if need_evict: _puts_since_evict = 0
+    if need_evict: evict()
+
+
+def _remember(source, key, expires, value):
+    with _lock:
+        if len(_memo) >= MAX_ENTRIES: _memo.clear()
+        _memo[(source, key)] = (expires, value)
+
+
+def evict(max_entries=None):
+    """清掉过期条目，总数仍超上限就按过期时间从早到晚淘汰到 90%"""
+    max_entries = max_entries or MAX_ENTRIES
+    conn = _connect()
+    conn.execute("DELETE FROM lookup WHERE expires <= ?", (time.time(),))
+    total = conn.execute("SELECT COUNT(*) FROM lookup").fetchone()[0]
+    if total > max_entries:
+        conn.execute("""
+            DELETE FROM lookup WHERE rowid IN (
+                SELECT rowid FROM lookup ORDER BY expires ASC LIMIT ?
+            )
+        """, (total - int(max_entries * 0.9),))
+        with _lock:
+            _memo.clear()
+    conn.commit()
+
+
+def clear(source=None):
+    conn = _connect()
+    if source:
+        conn.execute("DELETE FROM lookup WHERE source = ?", (source,))
+    else:
+        conn.execute("DELETE FROM lookup")
+    conn.commit()
+    with _lock:
+        _memo.clear()
+
+
+def stats():
+    """各数据源的缓存条数：{source: (命中条数, 未命中条数)}"""
+    rows = _connect().execute(
+        "SELECT source, SUM(hit), COUNT(*) - SUM(hit) FROM lookup WHERE expires > ? GROUP BY source",
+        (time.time(),)).fetchall()
+    return {source: (hits, misses) for source, hits, misses in rows}
+
+
+def lookup(source, name):
+    """按名字查缓存 (批量查询用)，返回 (是否命中缓存, 值)"""
+    if not CACHE_ENABLED or not name: return False, None
+    return get(source, normalize_key(name))
+
+
+def store(source, name, value):
+    """按名字写缓存 (批量查询用)，value 为 None 表示查无此物"""
+    if CACHE_ENABLED and name: put(source, normalize_key(name), value)
+
+
+# ==========================================
+# 🎁 装饰器：给查询函数套上缓存
+# ==========================================
+
+def cached(source, miss=None):
+    """
+    按【规范化后的名字】缓存查询结果。
+    miss: 被装饰函数“查不到”时的返回值，例如 None 或 (None, None)
+    联网出错 (抛异常) 的结果不缓存，下次还会重试。
+    每次调用都记进 metrics：缓存命中记 cached，真联网的记 hit / miss / timeout / error。
+    """
+
+    def decorator(func):
+        measured = metrics.instrument(source, miss)(func)  # 真正联网的那次才计时
+
+        @functools.wraps(func)
+        def wrapper(name, *args, **kwargs):
+            if not CACHE_ENABLED or not name:
+                return measured(name, *args, **kwargs)
+
+            key = normalize_key(name)
+            found, value = get(source, key)
+            if found:
+                metrics.record(source, "cached")
+                if value is None: return miss
+                return tuple(value) if isinstance(miss, tuple) else value
+
+            try:
+                value = measured(name, *args, **kwargs)
+            except Exception:
+                return miss
+            put(source, key, None if value == miss else value)
+            return value
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
+
+
+if __name__ == '__main__':
+    import sys
+
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if cmd == "clear":
+        clear(sys.argv[2] if len(sys.argv) > 2 else None)
+        print("🧹 缓存已清空")
+    elif cmd == "evict":
+        evict()
+        print("🧹 已清理过期缓存")
+    else:
+        for src, (hits, misses) in sorted(stats().items()):
+            print(f"{src:12s} 命中 {hits:6d} 条 | 查无 {misses:6d} 条")
@@ -1,5 +1,14 @@
-import requests
+import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeout
+import catalog
+import metrics
+import name_index
+import plant_cache
+import resolver_service
+import taxonomy
+import transport
 
 # ==========================================
 # ⚙️ 配置区域
@@ -14,6 +23,34 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) PlantReviewApp/5.0"
 }
 
+# 每个名字最多等多少秒 (各数据源并发查询，超时的直接放弃)
+RESOLVE_DEADLINE = 8
+_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="plant-expert")
+
+
+def _submit(deadline, func, *args):
+    """交给线程池查，带上调用方的截止时间 (过了截止时间才回来的，统计里只记一次 timeout)"""
+    return _POOL.submit(metrics.run_until, deadline, func, *args)
+
+
+# 解析服务 (resolver_service.py)：设了地址就交给它查，几个进程共用一份缓存和限速；连不上再本进程自己查
+RESOLVER_URL = os.environ.get("PLANT_RESOLVER_URL")
+
+# 批量解析：Wikidata SPARQL 一次最多查几个名字，以及同时跑几个名字
+SPARQL_URL = "https://query.wikidata.org/sparql"
+BATCH_SIZE = 50
+MANY_WORKERS = 8
+ZH_LANGS = ("zh", "zh-hans", "zh-cn")
+
+# GBIF 一次 occurrence 请求最多拿几张图 (同一物种的图片池)，只要 jpg/png，
+# 带了宽高的顺便把太小的筛掉
+GBIF_MEDIA_LIMIT = 8
+MEDIA_FORMATS = ("image/jpeg", "image/png")
+MIN_MEDIA_SIDE = 300
+
+# 返回内容解析失败才算“查无此物”；网络错误 / 429 会往上抛，交给缓存层处理 (不缓存)
+_PARSE_ERRORS = (KeyError, IndexError, TypeError, ValueError, AttributeError)
+
 # 📖 人工字典 (在这里修正搜错的植物！)
 CUSTOM_DICTIONARY = {
     "凤凰木": {"latin": "Delonix regia", "family": "豆科", "genus": "凤凰木属"},
@@ -92,16 +129,27 @@ def translate_latin_to_chinese(latin_name):
     if latin_name in FAMILY_DICT:
         return FAMILY_DICT[latin_name]
 
-    # 2. 联网查 Wikidata
+    # 2. 查离线分类库 (属名也有)
+    local = taxonomy.chinese_name(latin_name)
+    if local: return local
+
+    # 3. 联网查 Wikidata (结果有缓存)
+    return _translate_online(latin_name) or latin_name
+
+
+@plant_cache.cached("wikidata")
+def _translate_online(latin_name):
+    """Wikidata 查中文标签，查不到返回 None"""
     url = "https://www.wikidata.org/w/api.php"
     params = {"action": "wbsearchentities", "search": latin_name, "language": "zh", "format": "json", "limit": 1}
     try:
-        resp = requests.get(url, params=params, headers=HEADERS, timeout=3)
+        resp = transport.get(url, params=params, headers=HEADERS, timeout=3)
+        resp.raise_for_status()
         data = resp.json()
         if data.get("search"): return data["search"][0].get("label", latin_name)
-    except:
+    except _PARSE_ERRORS:
         pass
-    return latin_name
+    return None
 
 
 def get_latin_from_wikidata(chinese_name):
@@ -109,40 +157,81 @@ def get_latin_from_wikidata(chinese_name):
     url = "https://www.wikidata.org/w/api.php"
     params = {"action": "wbsearchentities", "search": chinese_name, "language": "zh", "format": "json", "limit": 1}
     try:
-        resp = requests.get(url, params=params, headers=HEADERS, timeout=3, proxies=PROXIES)
+        resp = transport.get(url, params=params, headers=HEADERS, timeout=3, proxies=PROXIES)
         data = resp.json()
         if not data.get("search"): return None
         entity_id = data["search"][0]["id"]
         ent_params = {"action": "wbgetentities", "ids": entity_id, "props": "claims", "format": "json"}
-        ent_resp = requests.get(url, params=ent_params, headers=HEADERS, timeout=3, proxies=PROXIES)
+        ent_resp = transport.get(url, params=ent_params, headers=HEADERS, timeout=3, proxies=PROXIES)
         claims = ent_resp.json().get("entities", {}).get(entity_id, {}).get("claims", {})
         if "P225" in claims: return claims["P225"][0]["mainsnak"]["datavalue"]["value"]
-    except:
+    except _PARSE_ERRORS:
         pass
     return None
 
 
+@plant_cache.cached("inaturalist", miss=(None, None))
 def get_latin_from_inaturalist(chinese_name):
     """iNat 翻译"""
     url = "https://api.inaturalist.org/v1/taxa"
     params = {"q": chinese_name, "per_page": 3, "locale": "zh-CN", "taxon_id": 47126}
     try:
-        resp = requests.get(url, params=params, headers=HEADERS, timeout=5)
+        resp = transport.get(url, params=params, headers=HEADERS, timeout=5)
+        resp.raise_for_status()
         data = resp.json()
         if data['results']:
             for res in data['results']:
                 if res['rank'] in ['species', 'variety', 'subspecies', 'hybrid']:
                     return res['name'], res.get('default_photo', {}).get('medium_url')
-    except:
+    except _PARSE_ERRORS:
         pass
     return None, None
 
 
+@plant_cache.cached("gbif_species")
+def get_taxonomy_from_gbif(query_name):
+    """GBIF 只查分类 (学名 / 科 / 属)，不搜图"""
+    try:
+        resp = transport.get("https://api.gbif.org/v1/species/search",
+                             params={"q": query_name, "limit": 1}, headers=HEADERS, timeout=5)
+        resp.raise_for_status()
+        data = resp.json()
+        if not data['results']: return None
+        sp = data['results'][0]
+        if sp.get('rank') in ['CLASS', 'ORDER', 'PHYLUM', 'KINGDOM']: return None
+        return {"scientific_name": sp.get('scientificName'), "family": sp.get('family'), "genus": sp.get('genus')}
+    except _PARSE_ERRORS:
+        return None
+
+
+def _usable_media(medium):
+    """不下载就能判断的：是静态图、格式是 jpg/png、(如果给了宽高) 不太小"""
+    if medium.get('type', 'StillImage') != 'StillImage' or not medium.get('identifier'): return False
+    fmt = (medium.get('format') or '').lower()
+    if fmt and fmt not in MEDIA_FORMATS: return False
+    if not fmt and not medium['identifier'].lower().split('?')[0].endswith(('.jpg', '.jpeg', '.png')): return False
+    sides = [medium.get(k) for k in ('width', 'height') if isinstance(medium.get(k), int)]
+    return not sides or min(sides) >= MIN_MEDIA_SIDE
+
+
+def _pick_media(occurrences, limit=GBIF_MEDIA_LIMIT):
+    """每条观测记录取第一张能用的图 (不同记录的图差别大)，去重，最多 limit 张"""
+    urls = []
+    for occ in occurrences:
+        for medium in occ.get('media', []):
+            if _usable_media(medium):
+                if medium['identifier'] not in urls: urls.append(medium['identifier'])
+                break
+    return urls[:limit]
+
+
+@plant_cache.cached("gbif")
 def _query_gbif(query_name):
     """GBIF 查详情 (严格过滤标本照)"""
     try:
-        r1 = requests.get("https://api.gbif.org/v1/species/search",
+        r1 = transport.get("https://api.gbif.org/v1/species/search",
                           params={"q": query_name, "limit": 1}, headers=HEADERS, timeout=5)
+        r1.raise_for_status()
         d1 = r1.json()
         if not d1['results']: return None
         sp = d1['results'][0]
@@ -156,48 +245,53 @@ def _query_gbif(query_name):
             "image_url": None
         }
 
-        # 🚨 关键修改：只搜【人眼观测】和【活体】，拒绝【标本】
-        r2 = requests.get("https://api.gbif.org/v1/occurrence/search",
+        # 🚨 关键修改：只搜【人眼观测】和【活体】，拒绝【标本】；一次拿前 GBIF_MEDIA_LIMIT 条记录的图
+        r2 = transport.get("https://api.gbif.org/v1/occurrence/search",
                           params={
                               "taxonKey": sp.get('key'),
                               "mediaType": "StillImage",
-                              "limit": 1,
+                              "limit": GBIF_MEDIA_LIMIT,
                               "basisOfRecord": ["HUMAN_OBSERVATION", "LIVING_SPECIMEN"]  # 排除 PRESERVED_SPECIMEN
                           },
                           headers=HEADERS, timeout=5)
-        d2 = r2.json()
-        if d2['results']:
-            media = d2['results'][0].get('media', [])
-            if media: result["image_url"] = media[0].get('identifier')
+        r2.raise_for_status()
+        urls = _pick_media(r2.json()['results'])
+        if urls:
+            result["image_url"] = urls[0]
+            result["image_urls"] = urls
         return result
-    except:
+    except _PARSE_ERRORS:
         return None
 
 
+@plant_cache.cached("wikimedia")
 def get_image_from_wikimedia(scientific_name):
     """Wiki 搜图"""
     url = "https://commons.wikimedia.org/w/api.php"
     params = {"action": "query", "generator": "search", "gsrsearch": f"{scientific_name} filetype:bitmap",
               "gsrlimit": 1, "prop": "imageinfo", "iiprop": "url", "format": "json"}
     try:
-        r = requests.get(url, params=params, headers=HEADERS, timeout=5, proxies=PROXIES)
+        r = transport.get(url, params=params, headers=HEADERS, timeout=5, proxies=PROXIES)
+        r.raise_for_status()
         pages = r.json().get("query", {}).get("pages", {})
         for _, val in pages.items(): return val.get("imageinfo", [{}])[0].get("url")
-    except:
+    except _PARSE_ERRORS:
         pass
     return None
 
 
+@plant_cache.cached("bing")
 def search_bing_image(keyword):
     """Bing 搜图 (优化关键词)"""
     try:
         url = "https://www.bing.com/images/search"
         # 🚨 关键修改：加上 "leaves flower" (叶子 花)，防止搜到虫子
         params = {"q": f"{keyword} plant leaves flower", "first": 1, "count": 1}
-        resp = requests.get(url, params=params, headers=HEADERS, timeout=5)
+        resp = transport.get(url, params=params, headers=HEADERS, timeout=5)
+        resp.raise_for_status()
         links = re.findall(r'murl&quot;:&quot;(.*?)&quot;', resp.text)
         if links: return links[0]
-    except:
+    except _PARSE_ERRORS:
         pass
     return None
 
@@ -206,47 +300,88 @@ def search_bing_image(keyword):
 # 🎮 总指挥
 # ==========================================
 
-def fetch_plant_info(plant_name):
-    latin_name = None
-    fallback_image = None
-    print(f"    🔍 解析 [{plant_name}] ...", end="")
-
-    # 1. 查字典
-    if plant_name in CUSTOM_DICTIONARY:
-        entry = CUSTOM_DICTIONARY[plant_name]
-        if isinstance(entry, dict):
-            print(f" (完美字典命中) ✅")
-            # 字典命中也要去搜图
-            img_url = None
-            gbif_data = _query_gbif(entry['latin'])
-            if gbif_data: img_url = gbif_data['image_url']
-            if not img_url:
-                wiki = get_image_from_wikimedia(entry['latin'])
-                if wiki: img_url = wiki
-            if not img_url: img_url = search_bing_image(entry['latin'])
-
-            return {
-                "name_cn": plant_name,
-                "scientific_name": entry['latin'],
-                "family": entry.get('family'),  # 已经是中文
-                "genus": entry.get('genus'),  # 已经是中文
-                "family_cn": entry.get('family'),
-                "genus_cn": entry.get('genus'),
-                "image_url": img_url
-            }
-        else:
-            latin_name = entry
-
-    # 2. 查学名
-    if not latin_name:
-        wiki_id = get_latin_from_wikidata(plant_name)
-        # 这里需要 get_name_by_id 函数，为了节省篇幅我整合到 wiki_id 里了，或者你可以直接忽略
-        # 简单起见，如果 wikidata 返回了 ID，我们假设这步跳过，让 iNat 接手，或者依赖 iNat
-        pass
+def _first_by_priority(candidates, deadline):
+    """
+    candidates: [(来源, future, 取值函数), ...]，按优先级从高到低排好。
+    返回第一个有结果的 (来源, 值)。高优先级一出结果，剩下还没开始的请求直接取消；
+    已经发出去的请求没法中断，但结果照样会进缓存，不算白跑。
+    超时的每个来源只记一次 timeout：没开始的在这里取消时记，已经在跑的回来时由 instrument 记。
+    """
+    winner = (None, None)
+    for i, (source, future, pick) in enumerate(candidates):
+        try:
+            value = pick(future.result(timeout=max(0, deadline - time.monotonic())))
+        except FutureTimeout:
+            # 时间到了：高优先级还没回来，那就看看低优先级里有没有已经回来的
+            for late_source, late_future, late_pick in candidates[i + 1:]:
+                if late_future.done() and not late_future.exception():
+                    value = late_pick(late_future.result())
+                    if value:
+                        winner = (late_source, value)
+                        break
+            for late_source, late_future, _ in candidates[i:]:
+                if late_future.cancel(): metrics.record(late_source, "timeout")
+            break
+        except Exception:
+            continue
+        if value:
+            winner = (source, value)
+            break
+
+    for _, future, _ in candidates: future.cancel()
+    return winner
+
+
+def _search_images(search_term, latin_name, bing_query, deadline):
+    """并发搜图：GBIF / Wikimedia / Bing 同时发出，按 GBIF > Wiki > Bing 的顺序取图"""
+    gbif_future = _submit(deadline, _query_gbif, search_term)
+    candidates = [("gbif", gbif_future, lambda d: d.get("image_url") if d else None)]
+    if latin_name:
+        candidates.append(("wikimedia", _submit(deadline, get_image_from_wikimedia, latin_name), lambda url: url))
+    candidates.append(("bing", _submit(deadline, search_bing_image, bing_query), lambda url: url))
+
+    source, image_url = _first_by_priority(candidates, deadline)
+
+    # GBIF 的科属信息不管图有没有选它都要用，还没回来就在截止时间内再等等
+    try:
+        gbif_data = gbif_future.result(timeout=max(0, deadline - time.monotonic()))
+    except Exception:
+        gbif_data = None
+
+    # 备选图：选中的排第一，其余已经回来的按优先级排后面 (不再额外等)，选中的那张挂了可以换
+    urls = [image_url]
+    for _, future, pick in candidates:
+        if future.done() and not future.cancelled() and not future.exception():
+            urls.append(pick(future.result()))
+    if gbif_data: urls.extend(gbif_data.get("image_urls", []))  # GBIF 同一物种的其它照片
+    return gbif_data, image_url, source, [u for u in dict.fromkeys(urls) if u]
+
+
+def _silent(*args, **kwargs):
+    pass
+
+
+def _dictionary_info(plant_name, entry, deadline, with_images=True):
+    """完美字典命中：文字全用字典的，只去搜图"""
+    img_url = img_source = None
+    img_candidates = []
+    if with_images:
+        _, img_url, img_source, img_candidates = _search_images(entry['latin'], entry['latin'], entry['latin'], deadline)
+    return {
+        "name_cn": plant_name,
+        "scientific_name": entry['latin'],
+        "family": entry.get('family'),  # 已经是中文
+        "genus": entry.get('genus'),  # 已经是中文
+        "family_cn": entry.get('family'),
+        "genus_cn": entry.get('genus'),
+        "image_url": img_url,
+        "image_source": img_source,
+        "image_candidates": img_candidates
+    }
 
-    if not latin_name:
-        latin_name, fallback_image = get_latin_from_inaturalist(plant_name)
 
+def _build_info(plant_name, latin_name, fallback_image, deadline, say=_silent):
+    """学名定好之后：并发搜图 + 拿 GBIF 的科属 (科名还没翻译)"""
     search_term = latin_name if latin_name else plant_name
 
     # 3. 构造
@@ -254,36 +389,315 @@ def fetch_plant_info(plant_name):
         "name_cn": plant_name,
         "scientific_name": search_term,
         "family": None, "genus": None, "image_url": None,
-        "family_cn": None, "genus_cn": None
+        "family_cn": None, "genus_cn": None, "image_source": None
     }
 
-    # 4. 搜图
-    gbif_data = _query_gbif(search_term)
+    # 4. 搜图 (GBIF / Wiki / Bing 并发，按优先级取)
+    gbif_data, img_url, img_source, img_candidates = _search_images(
+        search_term, latin_name, latin_name if latin_name else f"{plant_name}", deadline)
     if gbif_data:
         final_info.update(gbif_data)
         final_info['name_cn'] = plant_name
 
-    if not final_info['image_url'] and latin_name:
-        wiki_img = get_image_from_wikimedia(latin_name)
-        if wiki_img: final_info['image_url'] = wiki_img
-
-    if not final_info['image_url']:
-        print(" -> 启用Bing...", end="")
-        bing_query = latin_name if latin_name else f"{plant_name}"
-        bing_img = search_bing_image(bing_query)
-        if bing_img: final_info['image_url'] = bing_img
+    if img_source == "bing": say(" -> 启用Bing...", end="")
+    final_info['image_url'] = img_url
+    final_info['image_source'] = img_source
+    final_info['image_candidates'] = img_candidates + ([fallback_image] if fallback_image else [])
 
     if not final_info['image_url'] and fallback_image:
         final_info['image_url'] = fallback_image
+        final_info['image_source'] = "inaturalist"
+    return final_info
 
-    # 5. 翻译科属 (调用本地大字典)
-    print(" -> 翻译科属...", end="")
+
+def _metadata_info(plant_name, latin_name, local, deadline):
+    """只要文字不要图：分类库没给全科属才问 GBIF 的分类接口；科属只做离线翻译"""
+    search_term = latin_name if latin_name else plant_name
+    final_info = {
+        "name_cn": plant_name,
+        "scientific_name": search_term,
+        "family": None, "genus": None, "image_url": None,
+        "family_cn": None, "genus_cn": None, "image_source": None, "image_candidates": []
+    }
+    _apply_taxonomy(final_info, local)
+    if not (final_info['family'] and final_info['genus']):
+        future = _submit(deadline, get_taxonomy_from_gbif, search_term)
+        try:
+            gbif_data = future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeout:
+            if future.cancel(): metrics.record("gbif_species", "timeout")
+            gbif_data = None
+        except Exception:
+            gbif_data = None
+        if gbif_data:
+            for key, value in gbif_data.items():
+                if key == 'scientific_name' and latin_name: continue
+                final_info[key] = final_info.get(key) or value
+    return _finish_info(final_info, FAMILY_DICT.get(final_info['family']))
+
+
+def _apply_taxonomy(final_info, local):
+    """离线分类库查到的科属：拉丁名只补空缺，中文名优先用库里的"""
+    if not local: return final_info
+    for key in ('family', 'genus'):
+        final_info[key] = final_info.get(key) or local.get(key)
+    for key in ('family_cn', 'genus_cn'):
+        if local.get(key): final_info[key] = local[key]
+    return final_info
+
+
+def _finish_info(final_info, family_cn):
+    """填上翻译好的科名；属名先查离线分类库，查不到就只能显示拉丁"""
     if final_info.get('family'):
-        final_info['family_cn'] = translate_latin_to_chinese(final_info['family'])
-    # 属名太多，如果字典里没定义，就只能显示拉丁或未知
+        final_info['family_cn'] = final_info.get('family_cn') or family_cn or final_info['family']
     if not final_info.get('genus_cn') and final_info.get('genus'):
-        final_info['genus_cn'] = final_info['genus']  # 暂时用拉丁代替，或者留空
+        final_info['genus_cn'] = taxonomy.chinese_name(final_info['genus']) or final_info['genus']
+    return final_info
+
+
+def _local_match(plant_name):
+    """
+    联网之前先查本地：名字归一化后 (去空格、全角、引号、命名人) 查字典和名字索引，
+    学名以它们为准，分类库只用来补科属；名字索引没有的才直接拿名字查分类库。
+    返回 (字典条目, 分类库结果, 学名)，都查不到的是 None
+    """
+    hit = name_index.best(plant_name)
+    names = [plant_name] + ([hit["name"]] if hit else [])
+    entry = next((CUSTOM_DICTIONARY[n] for n in names if n in CUSTOM_DICTIONARY), None)
+    if isinstance(entry, dict): return entry, None, entry["latin"]
+    latin_name = entry or (hit and hit["latin"])
+    local = taxonomy.lookup(plant_name)  # 按名字查能带上人工校对过的中文科属
+    if latin_name and local and local['scientific_name'] != latin_name: local = None
+    if latin_name and not local: local = taxonomy.lookup(latin_name)
+    if not latin_name: latin_name = local and local['scientific_name']
+    return entry, local, latin_name
+
+
+@metrics.instrument("fetch_plant_info", ok=lambda info: bool(info and (info.get('image_url') or info.get('family'))))
+def fetch_plant_info(plant_name, timeout=None, verbose=True, with_images=True):
+    """
+    解析一个植物名。各数据源并发查询，timeout 秒 (默认 RESOLVE_DEADLINE) 内
+    没回来的源直接放弃，保证最慢也不会卡住页面太久。
+    verbose=False 时不打印进度 (多线程批量跑的时候用)。
+    with_images=False 时只查学名和科属，不搜图 (修 info.txt 用)；
+    科属只用本地字典和分类库翻译，翻不了的留拉丁名，交给调用方去重后联网翻译。
+    设了 RESOLVER_URL 就先问解析服务，连不上再本进程自己查。
+    查的时候用归一化后的名字，返回的 name_cn 还是调用方给的原样 (App 拿它和卡片名比对)。
+    """
+    info = _fetch_plant_info(name_index.clean(plant_name), timeout, verbose, with_images)
+    if info: info['name_cn'] = plant_name
+    return info
+
+
+def _fetch_plant_info(plant_name, timeout, verbose, with_images):
+    say = print if verbose else _silent
+    if RESOLVER_URL:
+        try:
+            info = resolver_service.remote_resolve(RESOLVER_URL, plant_name, timeout or RESOLVE_DEADLINE, with_images)
+            say(f"    🔍 解析 [{plant_name}] (解析服务) 完成 ✅")
+            return info
+        except resolver_service.ResolverUnavailable:
+            pass
+
+    deadline = time.monotonic() + (timeout or RESOLVE_DEADLINE)
+    fallback_image = None
+    say(f"    🔍 解析 [{plant_name}] ...", end="")
 
-    print(" 完成 ✅")
+    # 1. 查字典 + 2. 查离线分类库和名字索引 (微秒级，查到了就不用联网问学名)
+    entry, local, latin_name = _local_match(plant_name)
+    if isinstance(entry, dict):
+        say(f" (完美字典命中) ✅")
+        # 字典命中也要去搜图
+        return _dictionary_info(plant_name, entry, deadline, with_images)
+    if latin_name and not entry: say(" (本地命中)", end="")
+
+    # 3. 查学名 (Wikidata 的结果之前就没用上，省掉这两次请求，直接交给 iNat)
+    if not latin_name:
+        inat_future = _submit(deadline, get_latin_from_inaturalist, plant_name)
+        try:
+            latin_name, fallback_image = inat_future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeout:
+            if inat_future.cancel(): metrics.record("inaturalist", "timeout")
+        except Exception:
+            pass
+
+    if not with_images:
+        final_info = _metadata_info(plant_name, latin_name, local, deadline)
+        say(" (只查科属) 完成 ✅")
+        return final_info
+
+    final_info = _apply_taxonomy(_build_info(plant_name, latin_name, fallback_image, deadline, say), local)
+
+    # 5. 翻译科属 (本地字典 / 分类库，都没有才联网)
+    say(" -> 翻译科属...", end="")
+    family_cn = None
+    if final_info.get('family') and not final_info.get('family_cn'):
+        translate_future = _submit(deadline, translate_latin_to_chinese, final_info['family'])
+        try:
+            family_cn = translate_future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeout:
+            if translate_future.cancel(): metrics.record("wikidata", "timeout")
+            family_cn = FAMILY_DICT.get(final_info['family'])
+        except Exception:
+            family_cn = FAMILY_DICT.get(final_info['family'])
+    _finish_info(final_info, family_cn)
+
+    say(" 完成 ✅")
+
+    return final_info
 
-    return final_info
\ No newline at end of file
+
+# ==========================================
+# 📦 批量解析 (整份名单一起查)
+# ==========================================
+
+@metrics.instrument("wikidata_sparql")
+def _sparql(query):
+    resp = transport.get(SPARQL_URL, params={"query": query, "format": "json"},
+                         headers=HEADERS, timeout=15, proxies=PROXIES)
+    resp.raise_for_status()
+    return resp.json()["results"]["bindings"]
+
+
+def _sparql_strings(values, langs=()):
+    """把一批字符串拼成 SPARQL 的 VALUES 列表 (可以带多个语言标签)"""
+    out = []
+    for v in values:
+        literal = '"' + v.replace("\\", "\\\\").replace('"', '\\"') + '"'
+        out.extend([literal + "@" + lang for lang in langs] if langs else [literal])
+    return " ".join(out)
+
+
+def get_latin_from_wikidata_many(chinese_names):
+    """一次 SPARQL 把一批中文名映射成学名 (P225)，返回 {中文名: 学名}，查不到的不在结果里"""
+    query = f"""
+        SELECT ?label ?taxon WHERE {{
+          VALUES ?label {{ {_sparql_strings(chinese_names, ZH_LANGS)} }}
+          ?item rdfs:label ?label; wdt:P225 ?taxon.
+        }}"""
+    found = {}
+    for row in _sparql(query):
+        found.setdefault(row["label"]["value"], row["taxon"]["value"])
+    return found
+
+
+def translate_latin_to_chinese_many(latin_names):
+    """一次 SPARQL 翻译一批拉丁名 (科/属)，返回 {拉丁名: 中文名}，优先 zh 标签"""
+    query = f"""
+        SELECT ?taxon ?label WHERE {{
+          VALUES ?taxon {{ {_sparql_strings(latin_names)} }}
+          ?item wdt:P225 ?taxon; rdfs:label ?label.
+          FILTER(LANG(?label) IN ({", ".join('"%s"' % lang for lang in ZH_LANGS)}))
+        }}"""
+    found = {}
+    for row in _sparql(query):
+        taxon, label = row["taxon"]["value"], row["label"]
+        if taxon not in found or label.get("xml:lang") == "zh":
+            found[taxon] = label["value"]
+    return found
+
+
+def _batched(source, names, batch_query):
+    """
+    先查缓存，剩下没缓存的按 BATCH_SIZE 一批批交给 batch_query ({名字: 结果})，
+    结果 (包括查不到) 都写回缓存，和单个查询共用一份缓存。
+    """
+    results, todo = {}, []
+    for name in names:
+        found, value = plant_cache.lookup(source, name)
+        if found:
+            if value is not None: results[name] = value
+        else:
+            todo.append(name)
+
+    for start in range(0, len(todo), BATCH_SIZE):
+        chunk = todo[start:start + BATCH_SIZE]
+        try:
+            answer = batch_query(chunk)
+        except Exception:
+            continue  # 网络出错不缓存，交给后面的单个查询兜底
+        for name in chunk:
+            plant_cache.store(source, name, answer.get(name))
+            if name in answer: results[name] = answer[name]
+    return results
+
+
+def fetch_plant_info_many(names, timeout=None):
+    """
+    批量解析一份名单，生成器，谁先查完先 yield (名字, info)。
+    - 名字先去重
+    - 中文名 -> 学名：Wikidata SPARQL 一次查 BATCH_SIZE 个，查不到的再单个问 iNat
+    - GBIF / 搜图按名字并发跑 (和 fetch_plant_info 一样的优先级)
+    - 本地字典里没有的科名攒起来一次 SPARQL 翻译
+    timeout: 每个名字的截止时间 (默认 RESOLVE_DEADLINE)，从它开始查算起
+    yield 出来的名字和 name_cn 都是调用方给的原样 (归一化后重复的取第一个)
+    """
+    names = [n for n in names if n and name_index.clean(n)]
+    originals = {}
+    for name in names: originals.setdefault(name_index.key(name), name)
+    for name, info in _fetch_plant_info_many(name_index.clean_names(names), timeout):
+        original = originals.get(name_index.key(name), name)
+        if info: info['name_cn'] = original
+        yield original, info
+
+
+def _fetch_plant_info_many(unique, timeout):
+    timeout = timeout or RESOLVE_DEADLINE
+    if RESOLVER_URL:
+        try:
+            yield from resolver_service.remote_resolve_many(RESOLVER_URL, unique, timeout)
+            return
+        except resolver_service.ResolverUnavailable:
+            pass
+
+    latin = {}
+    matches = {}
+    need_latin = []
+    for name in unique:
+        matches[name] = entry, local, latin_name = _local_match(name)
+        if latin_name:
+            latin[name] = latin_name
+        else:
+            need_latin.append(name)
+
+    # 1. 中文名批量换学名 (缓存 + SPARQL)
+    latin.update(_batched("wikidata_label", [n for n in need_latin if catalog.contains_chinese(n)],
+                          get_latin_from_wikidata_many))
+
+    def resolve(name):
+        deadline = time.monotonic() + timeout
+        entry, local, _ = matches[name]
+        if isinstance(entry, dict):
+            return _dictionary_info(name, entry, deadline), True
+        latin_name, fallback_image = latin.get(name), None
+        if not latin_name:
+            latin_name, fallback_image = get_latin_from_inaturalist(name)
+        info = _build_info(name, latin_name, fallback_image, deadline)
+        return _apply_taxonomy(info, local), False
+
+    # 2. 每个名字并发搜图；科名在字典里的直接出结果，不在的攒起来批量翻译
+    waiting = []
+    with ThreadPoolExecutor(max_workers=MANY_WORKERS, thread_name_prefix="plant-expert-many") as pool:
+        futures = {pool.submit(resolve, name): name for name in unique}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                info, done = future.result()
+            except Exception:
+                yield name, None
+                continue
+            family = info.get('family')
+            if done:
+                yield name, info
+            elif not family or info.get('family_cn') or family in FAMILY_DICT:
+                yield name, _finish_info(info, FAMILY_DICT.get(family))
+            elif taxonomy.chinese_name(family):
+                yield name, _finish_info(info, taxonomy.chinese_name(family))
+            else:
+                waiting.append((name, info))
+
+    # 3. 剩下的科名一次翻译完
+    families = sorted({info['family'] for _, info in waiting})
+    translated = _batched("wikidata", families, translate_latin_to_chinese_many)
+    for name, info in waiting:
+        yield name, _finish_info(info, translated.get(info['family']))
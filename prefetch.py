@@ -0,0 +1,94 @@
+import time
+import weakref
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+PREFETCH_AHEAD = 3  # 提前准备后面几张卡片
+STORE_SIZE = 8  # 每个会话最多存几张预取好的卡片
+IDLE_TIMEOUT = 900  # 会话多久没动静就不再预取 (秒)
+
+
+class Prefetcher:
+    """
+    后台预取接下来的卡片 (每个会话一个)：resolve(card) 在后台线程里把卡片数据准备好，
+    用户点下一个时直接拿结果。结果仓库有上限，题单换了就 reset()，
+    会话结束 (对象被回收) 或长时间没动静时自动停掉。
+    resolve 里不能调用 st.*，它跑在后台线程里。
+    """
+
+    def __init__(self, resolve, key=None, store_size=STORE_SIZE, workers=2):
+        self.resolve = resolve
+        self.key = key or (lambda card: card["name"])
+        self.store_size = store_size
+        self.lock = threading.Lock()
+        self.futures = OrderedDict()  # key -> Future (做完的和还在做的)
+        self.generation = 0
+        self.last_touch = time.monotonic()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        # 会话被回收时顺手关掉线程池
+        self._finalizer = weakref.finalize(self, self.pool.shutdown, wait=False, cancel_futures=True)
+
+    def _run(self, generation, card):
+        # 题单已经换了，或者会话很久没动静了，就别白跑
+        if generation != self.generation or time.monotonic() - self.last_touch > IDLE_TIMEOUT:
+            return None
+        return self.resolve(card)
+
+    def schedule(self, cards):
+        """把接下来要用的卡片排进后台队列 (已经在做 / 做好的不重复排)"""
+        self.last_touch = time.monotonic()
+        with self.lock:
+            for card in cards:
+                k = self.key(card)
+                if k in self.futures: continue
+                try:
+                    self.futures[k] = self.pool.submit(self._run, self.generation, card)
+                except RuntimeError:
+                    return  # 线程池已经关了
+            self._trim()
+
+    def _trim(self):
+        """仓库超过上限就扔掉最久没用的 (调用方持有 self.lock)"""
+        while len(self.futures) > self.store_size:
+            _, future = self.futures.popitem(last=False)
+            future.cancel()
+
+    def get(self, card, timeout=None):
+        """
+        取一张卡片的数据：预取好了直接拿，正在做就等它，没排上就当场做。
+        拿过的结果还留在仓库里 (按最近使用排)，点“上一个”退回来不用重查。
+        """
+        self.last_touch = time.monotonic()
+        k = self.key(card)
+        with self.lock:
+            future = self.futures.get(k)
+            if future is not None: self.futures.move_to_end(k)
+        if future is not None and not future.cancelled():
+            try:
+                result = future.result(timeout=timeout)
+                if result is not None: return result
+            except Exception:
+                pass
+        result = self.resolve(card)
+        with self.lock:
+            done = Future()
+            done.set_result(result)
+            self.futures[k] = done
+            self._trim()
+        return result
+
+    def reset(self):
+        """题单换了：作废所有预取结果"""
+        with self.lock:
+            self.generation += 1
+            for future in self.futures.values(): future.cancel()
+            self.futures.clear()
+
+    def stop(self):
+        self.reset()
+        self._finalizer()
@@ -0,0 +1,191 @@
+import os
+import glob
+import json
+import atexit
+import threading
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+# 每个进程一个队列文件 (progress_queue.<pid>.jsonl)：多个 App 进程共用一个文件的话，
+# 一个进程写回后重写文件会把别的进程刚追加的记录冲掉。进程挂了留下的文件，下一个启动的进程接手
+QUEUE_PATH = os.path.join("cache", "progress_queue.jsonl")
+FLUSH_INTERVAL = 15  # 秒，后台多久批量写一次云端
+FLUSH_BATCH = 50  # 攒够这么多条也立刻写
+MAX_BACKOFF = 300  # 云端挂了的时候，最多隔多久重试一次
+
+HEADER = ["User", "Mastered_Plants"]
+PLANTS_COL = "B"
+
+
+def split_plants(cell):
+    return [p for p in (cell or "").split(",") if p]
+
+
+def _alive(pid):
+    """进程还在不在 (不发信号，Windows 上 os.kill 会直接把进程杀掉)"""
+    if os.name == "nt":
+        import ctypes
+
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle: return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def process_path(path, pid=None):
+    """cache/progress_queue.jsonl -> cache/progress_queue.<pid>.jsonl"""
+    base, ext = os.path.splitext(path)
+    return f"{base}.{pid or os.getpid()}{ext}"
+
+
+def apply_events(plants, events):
+    """把 (植物, add/remove) 事件按顺序应用到已斩杀列表上"""
+    plants = list(plants)
+    for plant, action in events:
+        if action == "add" and plant not in plants:
+            plants.append(plant)
+        elif action == "remove" and plant in plants:
+            plants.remove(plant)
+    return plants
+
+
+class ProgressSync:
+    """
+    写后回写：斩杀 / 取消先记到本地队列 (落盘，进程挂了也不丢)，
+    后台线程定时按行批量写回表格，只改涉及到的用户那一格，不整表覆盖。
+    云端慢或挂了就留在队列里，退避后重试。
+    worksheet_factory: 返回 gspread Worksheet 的函数
+    """
+
+    def __init__(self, worksheet_factory, path=QUEUE_PATH, interval=FLUSH_INTERVAL):
+        self.worksheet_factory = worksheet_factory
+        self.path = process_path(path)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.pending = self._load(self.path)  # [(user, plant, action), ...]
+        self._adopt(path)
+        self.failures = 0
+        self.last_error = None
+        self.thread = threading.Thread(target=self._run, name="progress-sync", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    # --- 本地队列 ---
+    @staticmethod
+    def _load(path):
+        events = []
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                        events.append((rec["user"], rec["plant"], rec["action"]))
+                    except (ValueError, KeyError):
+                        continue
+        return events
+
+    def _adopt(self, path):
+        """接手已经退出的进程没写回的队列 (还有旧版本所有进程共用的那个文件)：先并进自己的文件，再删掉它们"""
+        base, ext = os.path.splitext(path)
+        orphans = [path] if os.path.exists(path) else []
+        for other in glob.glob(glob.escape(base) + ".*" + ext):
+            pid = other[len(base) + 1:-len(ext) or None]
+            if pid.isdigit() and int(pid) != os.getpid() and not _alive(int(pid)): orphans.append(other)
+        if not orphans: return
+        with self.lock:
+            for other in orphans: self.pending += self._load(other)
+            self._rewrite()
+        for other in orphans:
+            try:
+                os.remove(other)
+            except OSError:
+                pass
+
+    def _rewrite(self):
+        """用当前队列重写文件 (调用方持有 self.lock)"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for user, plant, action in self.pending:
+                f.write(json.dumps({"user": user, "plant": plant, "action": action}, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+
+    def record(self, user, plant, action="add"):
+        with self.lock:
+            self.pending.append((user, plant, action))
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"user": user, "plant": plant, "action": action}, ensure_ascii=False) + "\n")
+            if len(self.pending) >= FLUSH_BATCH: self.wakeup.set()
+
+    def pending_for(self, user):
+        with self.lock:
+            return [(plant, action) for u, plant, action in self.pending if u == user]
+
+    def apply_pending(self, user, plants):
+        """云端读到的列表 + 还没写回去的本地事件 = 用户真正的进度"""
+        return apply_events(plants, self.pending_for(user))
+
+    # --- 写回云端 ---
+    def flush(self):
+        """把当前队列批量写回表格，成功返回 True"""
+        with self.flush_lock:
+            with self.lock:
+                events = list(self.pending)
+            if not events: return True
+
+            try:
+                ws = self.worksheet_factory()
+                names = ws.col_values(1)
+                if not names: ws.append_row(HEADER)  # 空表先补表头
+                rows = {name: i + 1 for i, name in enumerate(names) if i > 0 and name}
+                users = list(dict.fromkeys(user for user, _, _ in events))
+                existing = [u for u in users if u in rows]
+
+                current = {u: [] for u in users}
+                if existing:
+                    cells = ws.batch_get([f"{PLANTS_COL}{rows[u]}" for u in existing])
+                    for u, cell in zip(existing, cells):
+                        current[u] = split_plants(cell[0][0] if cell and cell[0] else "")
+                for user in users:
+                    current[user] = apply_events(current[user], [(p, a) for u, p, a in events if u == user])
+
+                updates = [{"range": f"{PLANTS_COL}{rows[u]}", "values": [[",".join(current[u])]]} for u in existing]
+                if updates: ws.batch_update(updates)
+                new_rows = [[u, ",".join(current[u])] for u in users if u not in rows]
+                if new_rows: ws.append_rows(new_rows)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                return False
+
+            with self.lock:
+                # 写回期间新来的事件留着下次写
+                self.pending = self.pending[len(events):]
+                self._rewrite()
+            self.failures = 0
+            self.last_error = None
+            return True
+
+    def _run(self):
+        while True:
+            # 连续失败就指数退避，别把挂掉的接口打得更惨
+            wait = min(MAX_BACKOFF, self.interval * 2 ** self.failures) if self.failures else self.interval
+            self.wakeup.wait(wait)
+            self.wakeup.clear()
+            self.flush()
+
+    def status(self):
+        with self.lock:
+            return {"pending": len(self.pending), "failures": self.failures, "last_error": self.last_error}
@@ -0,0 +1,189 @@
+import json
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+import requests
+import metrics
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+# 多个 App 进程 (或下载 / 清洗脚本) 共用一个解析服务：一份缓存、一套对上游的限速，
+# 同一个名字同时被几个进程要，也只查一次。
+# 用法：python resolver_service.py [--port 8766] [--host 127.0.0.1]
+#       然后给 App / download_gbif.py / fix_data.py 设环境变量 PLANT_RESOLVER_URL=http://127.0.0.1:8766
+DEFAULT_PORT = 8766
+MAX_BATCH = 500  # 一次批量请求最多几个名字
+BATCH_WORKERS = 8  # 批量只查科属时同时跑几个
+RETRY_AFTER = 30  # 服务连不上后多久内不再尝试 (秒)，这段时间直接本进程自己查
+
+_lock = threading.Lock()
+_inflight = {}  # (名字, 是否搜图) -> Future
+_down_until = 0.0
+_session = requests.Session()
+
+
+class ResolverUnavailable(OSError):
+    """解析服务连不上 / 返回了看不懂的东西，调用方改成本进程自己查"""
+
+
+# ==========================================
+# 📞 客户端 (plant_expert 里设了 RESOLVER_URL 时调用)
+# ==========================================
+
+def _call(method, url, timeout, **kwargs):
+    global _down_until
+    if time.monotonic() < _down_until: raise ResolverUnavailable("resolver marked down")
+    try:
+        resp = _session.request(method, url, timeout=(2, timeout), **kwargs)
+        resp.raise_for_status()
+        return resp.json()
+    except (requests.RequestException, ValueError) as e:
+        _down_until = time.monotonic() + RETRY_AFTER
+        raise ResolverUnavailable(str(e))
+
+
+def remote_resolve(base_url, name, timeout, with_images=True):
+    """单个名字，返回 info 或 None (查无此物)"""
+    params = {"name": name, "timeout": timeout, "images": int(with_images)}
+    return _call("GET", base_url.rstrip("/") + "/resolve", timeout + 5, params=params).get("info")
+
+
+def remote_resolve_many(base_url, names, timeout, with_images=True):
+    """批量，按名单顺序返回 [(名字, info)]"""
+    results = []
+    for i in range(0, len(names), MAX_BATCH):
+        chunk = names[i:i + MAX_BATCH]
+        body = {"names": chunk, "timeout": timeout, "images": with_images}
+        # 服务端并发查，整批最慢也就几轮截止时间
+        data = _call("POST", base_url.rstrip("/") + "/resolve", timeout * 4 + 10, json=body)
+        results += [(r["name"], r.get("info")) for r in data["results"]]
+    return results
+
+
+# ==========================================
+# 🖥️ 服务端
+# ==========================================
+
+def resolve_shared(name, timeout=None, with_images=True):
+    """同一个名字正在查的话，等那一次的结果，不再重复查"""
+    import name_index
+    import plant_expert
+
+    key = (name_index.key(name), with_images)
+    with _lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner: future = _inflight[key] = Future()
+    if owner:
+        try:
+            future.set_result(plant_expert.fetch_plant_info(name, timeout, verbose=False, with_images=with_images))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with _lock:
+                _inflight.pop(key, None)
+    return future.result()
+
+
+def resolve_batch(names, timeout=None, with_images=True):
+    """搜图的走 fetch_plant_info_many (学名、科名批量查)；只查科属的并发逐个查"""
+    import name_index
+    import plant_expert
+
+    names = name_index.clean_names(names)[:MAX_BATCH]
+    if with_images:
+        found = dict(plant_expert.fetch_plant_info_many(names, timeout))
+    else:
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="resolver-batch") as pool:
+            found = dict(zip(names, pool.map(lambda n: resolve_shared(n, timeout, False), names)))
+    return [{"name": name, "info": found.get(name)} for name in names]
+
+
+def _flag(value, default=True):
+    if value is None: return default
+    return str(value).lower() not in ("0", "false", "no", "")
+
+
+def _timeout(value):
+    try:
+        return min(float(value), 60) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def serve(port=DEFAULT_PORT, host="127.0.0.1"):
+    """
+    GET  /resolve?name=凤凰木[&images=0][&timeout=8]       -> {"name", "info"}
+    POST /resolve {"names": [...], "images": true, "timeout": 8} -> {"results": [{"name", "info"}, ...]}
+    GET  /health  GET /metrics (Prometheus)
+    """
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    import plant_expert
+
+    plant_expert.RESOLVER_URL = None  # 服务自己当然是本进程查
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload, content_type="application/json; charset=utf-8"):
+            body = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            try:
+                parts = urlsplit(self.path.encode("latin-1").decode("utf-8"))  # 没转义的中文 (curl 直接贴的)
+            except UnicodeError:
+                parts = urlsplit(self.path)
+            query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+            if parts.path == "/health":
+                return self._send(200, {"ok": True, "inflight": len(_inflight)})
+            if parts.path == "/metrics":
+                return self._send(200, metrics.prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+            if parts.path != "/resolve": return self._send(404, {"error": "not found"})
+            if not query.get("name", "").strip(): return self._send(400, {"error": "missing name"})
+            try:
+                info = resolve_shared(query["name"], _timeout(query.get("timeout")), _flag(query.get("images")))
+            except Exception as e:
+                return self._send(502, {"error": str(e)})
+            self._send(200, {"name": query["name"], "info": info})
+
+        def do_POST(self):
+            if urlsplit(self.path).path != "/resolve": return self._send(404, {"error": "not found"})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                names = body["names"]
+                if not isinstance(names, list): raise TypeError("names must be a list")
+            except (ValueError, KeyError, TypeError) as e:
+                return self._send(400, {"error": f"bad request: {e}"})
+            try:
+                results = resolve_batch([str(n) for n in names], _timeout(body.get("timeout")),
+                                        _flag(body.get("images")))
+            except Exception as e:
+                return self._send(502, {"error": str(e)})
+            self._send(200, {"results": results})
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == '__main__':
+    import sys
+
+    args = sys.argv[1:]
+    port = int(args[args.index("--port") + 1]) if "--port" in args else DEFAULT_PORT
+    host = args[args.index("--host") + 1] if "--host" in args else "127.0.0.1"
+    server = serve(port, host)
+    print(f"🌐 解析服务已启动：http://{host}:{port}/resolve (Ctrl+C 退出)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
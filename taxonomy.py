@@ -0,0 +1,365 @@
+import os
+import io
+import csv
+import sys
+import json
+import time
+import fnmatch
+import sqlite3
+import zipfile
+import threading
+from functools import lru_cache
+
+import catalog
+import name_index
+import plant_cache
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+TAXONOMY_PATH = os.environ.get("PLANT_TAXONOMY_PATH", os.path.join("data", "taxonomy.sqlite3"))
+SCHEMA_VERSION = 1
+
+SPECIES_RANKS = {"species", "subspecies", "variety", "form", "hybrid"}
+
+_local = threading.local()
+_build_lock = threading.Lock()
+_unavailable = set()  # 生成失败的库 (比如目录只读)，别每次查询都重试
+
+csv.field_size_limit(sys.maxsize)
+
+
+def _key(name):
+    return plant_cache.normalize_key(name)
+
+
+def _canonical(latin):
+    """去掉命名人：'Rosa chinensis Jacq.' -> 'Rosa chinensis' (和名字索引同一套规则，保留变种、亚种、杂交种、栽培品种)"""
+    return name_index.canonical_latin(latin)
+
+
+# ==========================================
+# 🗄️ 数据库
+# ==========================================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+-- 中文名 (或其它叫法) -> 学名；family_cn / genus_cn 是人工校对过的直接覆盖
+CREATE TABLE IF NOT EXISTS names (
+    key TEXT PRIMARY KEY, name TEXT NOT NULL, latin TEXT NOT NULL,
+    family_cn TEXT, genus_cn TEXT, source TEXT
+);
+-- 学名 -> 等级、属、科、中文名 (科、属本身也是一行，翻译科属就查这里)
+CREATE TABLE IF NOT EXISTS taxa (
+    key TEXT PRIMARY KEY, latin TEXT NOT NULL, rank TEXT,
+    genus TEXT, family TEXT, name_cn TEXT, source TEXT
+);
+"""
+
+
+def _connect(path=None):
+    path = path or TAXONOMY_PATH
+    conns = getattr(_local, "conns", None)
+    if conns is None: conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        if path in _unavailable: raise sqlite3.OperationalError(f"taxonomy unavailable: {path}")
+        if not os.path.exists(path):
+            try:
+                build(path=path)
+            except OSError:
+                _unavailable.add(path)
+                raise sqlite3.OperationalError(f"taxonomy unavailable: {path}")
+        conn = conns[path] = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    return conn
+
+
+def _add_name(conn, name, latin, source, family_cn=None, genus_cn=None):
+    """先写的优先 (字典 > 本地资料 > 外部数据)"""
+    if not name or not latin: return
+    conn.execute("INSERT OR IGNORE INTO names (key, name, latin, family_cn, genus_cn, source) VALUES (?, ?, ?, ?, ?, ?)",
+                 (_key(name), name.strip(), latin, family_cn, genus_cn, source))
+
+
+def _add_taxon(conn, latin, source, rank=None, genus=None, family=None, name_cn=None):
+    """同一个学名多次写入时只补空着的字段"""
+    if not latin: return
+    conn.execute("""
+        INSERT INTO taxa (key, latin, rank, genus, family, name_cn, source) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(key) DO UPDATE SET
+            rank = COALESCE(taxa.rank, excluded.rank),
+            genus = COALESCE(taxa.genus, excluded.genus),
+            family = COALESCE(taxa.family, excluded.family),
+            name_cn = COALESCE(taxa.name_cn, excluded.name_cn)
+    """, (_key(latin), latin, rank, genus, family, name_cn, source))
+
+
+# ==========================================
+# 📥 数据来源
+# ==========================================
+
+def _family_latin():
+    """中文科名 -> 拉丁科名 (同一个科有新旧两个名字时取字典里先出现的)"""
+    import plant_expert
+
+    reverse = {}
+    for latin, name_cn in plant_expert.FAMILY_DICT.items(): reverse.setdefault(name_cn, latin)
+    return reverse
+
+
+def _import_dictionaries(conn):
+    """plant_expert 里的人工字典和科名字典"""
+    import plant_expert
+
+    families = _family_latin()
+    for name, entry in plant_expert.CUSTOM_DICTIONARY.items():
+        if isinstance(entry, dict):
+            _add_name(conn, name, entry["latin"], "dictionary", entry.get("family"), entry.get("genus"))
+            _add_taxon(conn, entry["latin"], "dictionary", "species", genus=entry["latin"].split()[0],
+                       family=families.get(entry.get("family")))
+            _add_taxon(conn, entry["latin"].split()[0], "dictionary", "genus", name_cn=entry.get("genus"))
+        else:
+            _add_name(conn, name, entry, "dictionary")
+            _add_taxon(conn, entry, "dictionary", "species", genus=entry.split()[0])
+    for latin, name_cn in plant_expert.FAMILY_DICT.items():
+        _add_taxon(conn, latin, "dictionary", "family", name_cn=name_cn)
+
+
+def _import_local_tree(conn, roots):
+    """题库里已经整理好的 info.txt (文件夹名就是中文名)"""
+    families = _family_latin()
+    count = 0
+    for root in roots:
+        if not os.path.isdir(root): continue
+        for name in os.listdir(root):
+            folder = os.path.join(root, name)
+            if not os.path.isdir(folder): continue
+            info = catalog.read_info(folder)
+            latin = info.get("scientific_name")
+            # 学名得以属名 (或杂交符号) 开头，"'Adenium obesum' phyllody phytoplasma" 这种是查错了的病原体
+            if not latin or not (latin[:1].isupper() or latin.startswith("×")): continue
+            latin = _canonical(latin)
+            genus = info.get("genus_cn")
+            genus_cn = genus if catalog.contains_chinese(genus) else None
+            # 属名一律取学名的第一个词：info.txt 里拉丁文的 "属" 常是查错的 (Ilex cornuta 写成了 Carlavirus)
+            genus_latin = latin.lstrip("× ").split()[0]
+            family_cn = info.get("family_cn") if catalog.contains_chinese(info.get("family_cn")) else None
+            if catalog.contains_chinese(name):
+                _add_name(conn, name, latin, "local", family_cn, genus_cn)
+            _add_taxon(conn, latin, "local", "species", genus=genus_latin, family=families.get(family_cn))
+            if genus_cn: _add_taxon(conn, genus_latin, "local", "genus", name_cn=genus_cn)
+            count += 1
+    return count
+
+
+def _open_tables(path, pattern):
+    """path 可以是解压好的目录，也可以是 zip 包；按文件名通配符逐个打开里面的表"""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as z:
+            for member in z.namelist():
+                if fnmatch.fnmatch(os.path.basename(member), pattern):
+                    with z.open(member) as raw:
+                        yield io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    else:
+        for file in sorted(os.listdir(path)):
+            if fnmatch.fnmatch(file, pattern):
+                with open(os.path.join(path, file), "r", encoding="utf-8", newline="") as f:
+                    yield f
+
+
+def import_gbif_backbone(conn, path):
+    """
+    GBIF Backbone Taxonomy (backbone.zip 或解压目录，要 Taxon.tsv 和 VernacularName.tsv)。
+    只收植物界；异名指向接受名；中文俗名 (language=zh) 进 names，科属的中文名进 taxa。
+    """
+    accepted = {}  # taxonID -> (接受名, 等级)
+    synonyms = {}  # 异名 taxonID -> 接受名的 taxonID
+    count = 0
+    for table in _open_tables(path, "Taxon.tsv"):
+        for row in csv.DictReader(table, delimiter="\t", quoting=csv.QUOTE_NONE):
+            if row.get("kingdom") != "Plantae": continue
+            name = row.get("canonicalName") or ""
+            if not name: continue
+            rank = (row.get("taxonRank") or "").lower()
+            if row.get("taxonomicStatus") == "accepted":
+                accepted[row["taxonID"]] = (name, rank)
+                _add_taxon(conn, name, "gbif", rank, genus=row.get("genus") or None,
+                           family=row.get("family") or None)
+                count += 1
+            elif row.get("acceptedNameUsageID"):
+                synonyms[row["taxonID"]] = row["acceptedNameUsageID"]
+                synonyms[name] = row["acceptedNameUsageID"]
+
+    # 异名：学名直接查也能找到接受名
+    for key, accepted_id in synonyms.items():
+        if key in accepted or accepted_id not in accepted or key.isdigit(): continue
+        _add_name(conn, key, accepted[accepted_id][0], "gbif")
+
+    for table in _open_tables(path, "VernacularName.tsv"):
+        for row in csv.DictReader(table, delimiter="\t", quoting=csv.QUOTE_NONE):
+            if not (row.get("language") or "").startswith("zh"): continue
+            taxon_id = row["taxonID"]
+            latin, rank = accepted.get(taxon_id) or accepted.get(synonyms.get(taxon_id), (None, None))
+            name_cn = (row.get("vernacularName") or "").strip()
+            if not latin or not catalog.contains_chinese(name_cn): continue
+            if rank in SPECIES_RANKS:
+                _add_name(conn, name_cn, latin, "gbif")
+            else:
+                _add_taxon(conn, latin, "gbif", rank, name_cn=name_cn)
+                _add_name(conn, name_cn, latin, "gbif")
+    return count
+
+
+def import_inaturalist(conn, path):
+    """
+    iNaturalist 分类数据包 (inaturalist-taxonomy.dwca.zip 或解压目录，要 taxa.csv 和 VernacularNames-*.csv)。
+    只收植物界，中文俗名同上处理。
+    """
+    taxa = {}  # id -> (学名, 等级)
+    count = 0
+    for table in _open_tables(path, "taxa.csv"):
+        for row in csv.DictReader(table):
+            if row.get("kingdom") != "Plantae": continue
+            name = row.get("scientificName") or ""
+            rank = (row.get("taxonRank") or "").lower()
+            if not name: continue
+            taxa[row["id"]] = (name, rank)
+            _add_taxon(conn, name, "inaturalist", rank, genus=row.get("genus") or None,
+                       family=row.get("family") or None)
+            count += 1
+
+    for table in _open_tables(path, "VernacularNames*.csv"):
+        for row in csv.DictReader(table):
+            if not (row.get("language") or "").lower().startswith("zh"): continue
+            latin, rank = taxa.get(row.get("id"), (None, None))
+            name_cn = (row.get("vernacularName") or "").strip()
+            if not latin or not catalog.contains_chinese(name_cn): continue
+            if rank not in SPECIES_RANKS: _add_taxon(conn, latin, "inaturalist", rank, name_cn=name_cn)
+            _add_name(conn, name_cn, latin, "inaturalist")
+    return count
+
+
+def build(path=None, gbif=None, inat=None, roots=None):
+    """
+    生成离线分类库：字典 -> 本地 info.txt -> iNat 数据包 -> GBIF 骨架 (越靠前越优先)。
+    先写临时文件再替换，生成过程中 App 照常用旧库。
+    """
+    path = path or TAXONOMY_PATH
+    roots = roots or (os.path.join("images", "common"), os.path.join("images", "important"))
+    with _build_lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".building"
+        if os.path.exists(tmp): os.remove(tmp)
+        conn = sqlite3.connect(tmp)
+        conn.executescript(SCHEMA)
+        sources = {}
+        with conn:
+            _import_dictionaries(conn)
+            sources["local"] = _import_local_tree(conn, roots)
+            if inat: sources["inaturalist"] = import_inaturalist(conn, inat)
+            if gbif: sources["gbif"] = import_gbif_backbone(conn, gbif)
+            conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [
+                ("schema_version", str(SCHEMA_VERSION)),
+                ("built_at", time.strftime("%Y-%m-%d %H:%M:%S")),
+                ("sources", json.dumps(sources, ensure_ascii=False)),
+            ])
+        conn.close()
+        os.replace(tmp, path)
+    reset()
+    return sources
+
+
+def reset():
+    """库文件重建后，丢掉旧连接和查询缓存"""
+    for conn in getattr(_local, "conns", {}).values(): conn.close()
+    _local.conns = {}
+    _unavailable.clear()
+    _lookup.cache_clear()
+    chinese_name.cache_clear()
+
+
+# ==========================================
+# 🔍 查询 (微秒级，结果在进程内缓存)
+# ==========================================
+
+@lru_cache(maxsize=20000)
+def chinese_name(latin):
+    """科 / 属 / 种 的中文名，没有返回 None"""
+    if not latin: return None
+    try:
+        row = _connect().execute("SELECT name_cn FROM taxa WHERE key = ?", (_key(latin),)).fetchone()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def lookup(name):
+    """
+    中文名或学名 -> {"scientific_name", "genus", "family", "genus_cn", "family_cn"}，查不到返回 None。
+    只查本地库，不联网。
+    """
+    found = _lookup(name)
+    return dict(found) if found else None
+
+
+@lru_cache(maxsize=20000)
+def _lookup(name):
+    if not name or not name.strip(): return None
+    try:
+        conn = _connect()
+        row = conn.execute("SELECT latin, family_cn, genus_cn FROM names WHERE key = ?", (_key(name),)).fetchone()
+        if row:
+            latin, family_cn, genus_cn = row
+        elif not catalog.contains_chinese(name):
+            latin, family_cn, genus_cn = _canonical(name.strip()), None, None
+        else:
+            return None
+        taxon = conn.execute("SELECT latin, genus, family FROM taxa WHERE key = ?", (_key(latin),)).fetchone()
+    except sqlite3.Error:
+        return None
+    if not row and not taxon: return None
+
+    genus = taxon[1] if taxon else None
+    family = taxon[2] if taxon else None
+    if not genus and " " in latin: genus = latin.split()[0]
+    return {
+        "scientific_name": taxon[0] if taxon else latin,
+        "genus": genus,
+        "family": family,
+        "genus_cn": genus_cn or chinese_name(genus),
+        "family_cn": family_cn or chinese_name(family),
+    }
+
+
+def info():
+    """库的版本和来源统计"""
+    conn = _connect()
+    meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+    meta["names"] = conn.execute("SELECT COUNT(*) FROM names").fetchone()[0]
+    meta["taxa"] = conn.execute("SELECT COUNT(*) FROM taxa").fetchone()[0]
+    return meta
+
+
+if __name__ == '__main__':
+    # 用法：
+    #   python taxonomy.py build                          只用字典和本地题库生成
+    #   python taxonomy.py build --gbif backbone.zip      再加上 GBIF 骨架
+    #   python taxonomy.py build --inat inaturalist-taxonomy.dwca.zip
+    #   python taxonomy.py info
+    #   python taxonomy.py lookup 凤凰木
+    args = sys.argv[1:]
+    cmd = args[0] if args else "info"
+    if cmd == "build":
+        def opt(flag):
+            return args[args.index(flag) + 1] if flag in args else None
+
+        print("🏗️ 正在生成离线分类库...")
+        result = build(gbif=opt("--gbif"), inat=opt("--inat"))
+        print(f"🎉 完成：{TAXONOMY_PATH} {result}")
+    elif cmd == "lookup":
+        for name in args[1:]:
+            print(name, "->", lookup(name))
+    else:
+        for k, v in info().items():
+            print(f"{k}: {v}")
@@ -0,0 +1,24 @@
+import os
+import taxonomy
+
+
+def _plant(root, name, text):
+    folder = os.path.join(root, name)
+    os.makedirs(folder)
+    with open(os.path.join(folder, "info.txt"), "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_local_genus_comes_from_the_binomial(tmp_path, monkeypatch):
+    root = str(tmp_path / "common")
+    _plant(root, "枸骨", "中文名: 枸骨\n学名: Ilex cornuta Lindl. & Paxton\n科: 冬青科\n属: Carlavirus\n")
+    _plant(root, "兰花美人蕉", "中文名: 兰花美人蕉\n学名: Canna × orchioides L.H.Bailey\n科: Cannaceae\n属: Canna\n")
+    path = str(tmp_path / "taxonomy.sqlite3")
+    monkeypatch.setattr(taxonomy, "TAXONOMY_PATH", path)
+    try:
+        taxonomy.build(path=path, roots=(root,))
+        assert taxonomy.lookup("枸骨")["genus"] == "Ilex"
+        assert taxonomy.lookup("Ilex cornuta Lindl. & Paxton")["genus"] == "Ilex"
+        assert taxonomy.lookup("兰花美人蕉")["scientific_name"] == "Canna × orchioides"
+    finally:
+        taxonomy.reset()
@@ -0,0 +1,174 @@
+import os
+import time
+import random
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+import metrics
+from requests.adapters import HTTPAdapter
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+# 每个域名一个连接池 (keep-alive，省掉每次的 TCP+TLS 握手)
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+# 429 / 5xx 自动重试，退避时间带随机抖动
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# 每个域名的礼貌速率 (令牌桶)：(每秒请求数, 突发容量)
+RATE_LIMITS = {
+    "api.gbif.org": (10, 20),
+    "api.inaturalist.org": (1, 5),  # iNat 官方建议每分钟不超过 60 次
+    "www.wikidata.org": (5, 10),
+    "query.wikidata.org": (2, 5),
+    "commons.wikimedia.org": (5, 10),
+    "upload.wikimedia.org": (10, 20),
+    "www.bing.com": (2, 4),
+}
+DEFAULT_RATE = (10, 20)
+
+# 把外部请求改发到别的地址 (离线跑分 / 测试用)：{"api.gbif.org": "http://127.0.0.1:8765"}，"*" 表示全部。
+# 环境变量写法：PLANT_HOST_OVERRIDE="*=http://127.0.0.1:8765"，多个用逗号隔开
+HOST_OVERRIDES = dict(item.strip().split("=", 1)
+                      for item in os.environ.get("PLANT_HOST_OVERRIDE", "").split(",") if "=" in item)
+
+_sessions = {}
+_buckets = {}
+_lock = threading.Lock()
+
+
+class TokenBucket:
+    """令牌桶限速：平均每秒 rate 个，最多攒 capacity 个"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, max_wait=None):
+        """拿一个令牌，不够就睡到够为止；要等的比 max_wait 秒还久就不等了，返回 False"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if max_wait is not None:
+                if wait > max_wait: return False
+                max_wait -= wait
+            time.sleep(wait)
+
+
+def configure(pool_connections=None, pool_maxsize=None, rate_limits=None, host_overrides=None):
+    """调整连接池大小 / 速率限制 / 域名改写；已建好的会话会按新配置重建"""
+    global POOL_CONNECTIONS, POOL_MAXSIZE
+    with _lock:
+        if pool_connections: POOL_CONNECTIONS = pool_connections
+        if pool_maxsize: POOL_MAXSIZE = pool_maxsize
+        if rate_limits: RATE_LIMITS.update(rate_limits)
+        if host_overrides is not None:
+            HOST_OVERRIDES.clear()
+            HOST_OVERRIDES.update(host_overrides)
+        for session in _sessions.values(): session.close()
+        _sessions.clear()
+        _buckets.clear()
+
+
+def _session_for(host):
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[host] = session
+        return session
+
+
+def _bucket_for(host):
+    with _lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = _buckets[host] = TokenBucket(*RATE_LIMITS.get(host, DEFAULT_RATE))
+        return bucket
+
+
+def _backoff(attempt, response=None):
+    """第 attempt 次重试前要等多久：优先听服务器的 Retry-After"""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(BACKOFF_MAX, int(retry_after))
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _override(url, host, kwargs):
+    """按 HOST_OVERRIDES 改写地址；原来的域名放在 X-Original-Host 头里，不走代理"""
+    target = HOST_OVERRIDES.get(host) or HOST_OVERRIDES.get("*")
+    if not target: return url
+    parts, base = urlsplit(url), urlsplit(target)
+    kwargs.pop("proxies", None)
+    kwargs["headers"] = dict(kwargs.get("headers") or {}, **{"X-Original-Host": host})
+    return urlunsplit((base.scheme, base.netloc, parts.path, parts.query, ""))
+
+
+def _clamp(timeout, left):
+    """单次请求的超时不超过离截止时间还剩的秒数 (timeout 可以是 (连接, 读取) 元组)；没有截止时间原样返回"""
+    if left is None: return timeout
+    left = max(left, 0.01)
+    if isinstance(timeout, tuple): return tuple(left if t is None else min(t, left) for t in timeout)
+    return left if timeout is None else min(timeout, left)
+
+
+def _past_deadline(wait):
+    """再等 wait 秒重试的话，是不是已经过了调用方的截止时间"""
+    left = metrics.remaining()
+    return left is not None and wait >= left
+
+
+def get(url, retries=None, **kwargs):
+    """
+    代替 requests.get：同域名复用连接、按域名限速、429/5xx 和连接失败自动重试。
+    重试用完还是 429/5xx 就把最后一次的响应原样返回，调用方自己 raise_for_status。
+    在 metrics.run_until 里调用时 (plant_expert 的并发查询)，排队限速、单次超时、重试退避都不超过
+    调用方的截止时间：调用方不等了，这边也就不再占着线程池慢慢重试，过了截止时间抛 requests.Timeout。
+    """
+    host = urlsplit(url).hostname or ""
+    if HOST_OVERRIDES: url = _override(url, host, kwargs)
+    session = _session_for(host)
+    bucket = _bucket_for(host)
+    retries = MAX_RETRIES if retries is None else retries
+    timeout = kwargs.pop("timeout", None)
+
+    for attempt in range(retries + 1):
+        left = metrics.remaining()
+        if (left is not None and left <= 0) or not bucket.acquire(left):
+            raise requests.Timeout(f"deadline passed before requesting {host}")
+        try:
+            response = session.get(url, timeout=_clamp(timeout, metrics.remaining()), **kwargs)
+        except requests.ConnectionError:
+            wait = _backoff(attempt)
+            if attempt >= retries or _past_deadline(wait): raise
+            time.sleep(wait)
+            continue
+
+        if not kwargs.get("stream"): metrics.add_bytes(len(response.content))
+        if response.status_code not in RETRY_STATUS or attempt >= retries:
+            return response
+        wait = _backoff(attempt, response)
+        if _past_deadline(wait): return response
+        response.close()
+        time.sleep(wait)
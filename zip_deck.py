@@ -0,0 +1,120 @@
+import random
+import zipfile
+import threading
+import catalog
+
+# ==========================================
+# ⚙️ 配置区域
+# ==========================================
+
+MAX_MEMBERS = 5000  # 包里最多多少个文件
+MAX_TOTAL_SIZE = 1024 * 1024 * 1024  # 解压后总大小上限 (只读目录，不真解压，防压缩炸弹)
+MAX_MEMBER_SIZE = 20 * 1024 * 1024  # 单个文件解压后的上限
+MAX_RATIO = 200  # 单个文件压缩比上限，超过当成压缩炸弹
+
+IMAGE_EXTS = catalog.IMAGE_EXTS
+
+
+class ZipDeckError(ValueError):
+    """图片包不合规 (太大、文件太多、不是 zip)，message 直接给用户看"""
+
+
+def _member_name(info):
+    """
+    没带 UTF-8 标记的 zip，zipfile 按 cp437 解错了：macOS 打的包其实是 UTF-8 (只是没打标记)，
+    Windows 中文系统打的是 GBK。先按 UTF-8 严格解，解不了再当 GBK
+    """
+    if info.flag_bits & 0x800: return info.filename
+    try:
+        raw = info.filename.encode("cp437")
+    except UnicodeEncodeError:
+        return info.filename
+    for encoding in ("utf-8", "gbk"):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+    return info.filename
+
+
+class ZipDeck:
+    """
+    上传的 ZIP 图片包，原地建索引不解压：只读一次中央目录，
+    按文件夹名得到植物列表，翻到哪张才解压哪张图和它的 info.txt。
+    每个会话一个，互不干扰，也不落盘。
+    source: 文件路径或文件对象 (比如 st.file_uploader 的返回值)
+    """
+
+    def __init__(self, source):
+        try:
+            self.zip = zipfile.ZipFile(source)
+        except (zipfile.BadZipFile, OSError) as e:
+            raise ZipDeckError(f"不是有效的 zip 文件：{e}")
+        self.lock = threading.Lock()
+        self.plants = self._index(self.zip.infolist())
+
+    def _index(self, infos):
+        if len(infos) > MAX_MEMBERS:
+            raise ZipDeckError(f"图片包里文件太多 ({len(infos)} 个)，最多 {MAX_MEMBERS} 个")
+        total = sum(i.file_size for i in infos)
+        if total > MAX_TOTAL_SIZE:
+            raise ZipDeckError(f"图片包解压后太大 ({total // 1024 // 1024} MB)，最多 {MAX_TOTAL_SIZE // 1024 // 1024} MB")
+
+        files = []
+        for info in infos:
+            if info.is_dir(): continue
+            parts = [p for p in _member_name(info).split("/") if p]
+            if not parts or parts[0] == "__MACOSX" or parts[-1].startswith("."): continue
+            files.append((parts, info))
+
+        # 和原来一样：整个包只有一个顶层文件夹时，往里进一层
+        tops = {parts[0] for parts, _ in files if len(parts) > 1}
+        depth = 1 if len(tops) == 1 and all(len(parts) > 1 for parts, _ in files) else 0
+
+        plants = {}
+        for parts, info in files:
+            if len(parts) != depth + 2: continue  # 只认 植物文件夹/文件
+            name, file = parts[depth], parts[-1]
+            entry = plants.setdefault(name, {"images": [], "info": None})
+            if file.lower().endswith(IMAGE_EXTS) and self._safe(info):
+                entry["images"].append(info.filename)
+            elif file == "info.txt":
+                entry["info"] = info.filename
+        return {name: entry for name, entry in plants.items() if entry["images"]}
+
+    @staticmethod
+    def _safe(info):
+        if info.file_size > MAX_MEMBER_SIZE: return False
+        return info.compress_size == 0 or info.file_size / info.compress_size <= MAX_RATIO
+
+    def cards(self):
+        """每种植物一张卡片，随机挑一张图；卡片带着 deck，预取线程拿得到"""
+        return [{"name": name, "type": "zip", "deck": self, "image_member": random.choice(entry["images"]),
+                 "info_member": entry["info"]} for name, entry in self.plants.items()]
+
+    def read(self, member, limit=MAX_MEMBER_SIZE):
+        """解压一个文件；比声明的大就截断报错 (文件头可能是假的)"""
+        with self.lock, self.zip.open(member) as f:
+            data = f.read(limit + 1)
+        if len(data) > limit: raise ZipDeckError(f"{member} 解压后超过上限")
+        return data
+
+    def read_info(self, card):
+        if not card.get("info_member"): return {}
+        try:
+            return catalog.parse_info(self.read(card["info_member"], 64 * 1024).decode("utf-8"))
+        except (ZipDeckError, UnicodeDecodeError, zipfile.BadZipFile):
+            return {}
+
+    def load_card(self, card):
+        """准备一张卡片：解压这张图 + 读 info.txt (预取线程里也会调用，不能用 st.*)"""
+        plant_data = {"name_cn": card["name"]}
+        plant_data.update(self.read_info(card))
+        try:
+            plant_data["image_bytes"] = self.read(card["image_member"])
+        except (ZipDeckError, zipfile.BadZipFile, OSError):
+            plant_data["image_bytes"] = None
+        return plant_data
+
+    def close(self):
+        self.zip.close()